@@ -1,77 +1,164 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, List, Optional
 
+# Every node remembers where it started in the source (1-based line/col, 0 if
+# it was built by hand). Positions are left out of repr and == on purpose.
+# `trap` asks the interpreter to call _trap() before running a statement; it
+# is how step mode and breakpoints stop without a per-statement hook.
+@dataclass
+class Node:
+    line: int = field(default=0, kw_only=True, repr=False, compare=False)
+    col: int = field(default=0, kw_only=True, repr=False, compare=False)
+    trap: bool = field(default=False, kw_only=True, repr=False, compare=False)
+
 @dataclass
 class Program:
     statements: List[Any]
+    resolved: bool = field(default=False, kw_only=True, repr=False, compare=False)
+
+# Names read or written inside a `fun` body get a `slot`: their index in the
+# call's frame (parameters first, then every name the body makes with `let`).
+# -1 means the name is global and is looked up in the Env.
+def _slot():
+    return field(default=-1, kw_only=True, repr=False, compare=False)
 
 # statements
 @dataclass
-class LetStmt:
+class LetStmt(Node):
     name: str
     value: Any
+    slot: int = _slot()
 
 @dataclass
-class AssignStmt:
+class AssignStmt(Node):
     name: str
     value: Any
+    slot: int = _slot()
 
 @dataclass
-class ExprStmt:
+class ExprStmt(Node):
     expr: Any
 
 @dataclass
-class IfStmt:
+class IfStmt(Node):
     cond: Any
     then_body: List[Any]
     else_body: Optional[List[Any]] = None
+    # the answer the condition usually gives, tested first (set by kid_pgo)
+    likely: Optional[bool] = field(default=None, kw_only=True, repr=False, compare=False)
 
 @dataclass
-class WhileStmt:
+class WhileStmt(Node):
     cond: Any
     body: List[Any]
 
 @dataclass
-class RepeatStmt:
+class RepeatStmt(Node):
     count: Any
     body: List[Any]
 
+@dataclass
+class FunStmt(Node):
+    name: str
+    params: List[str]
+    body: List[Any]
+    slots: List[str] = field(default_factory=list)
+
+@dataclass
+class ReturnStmt(Node):
+    value: Any = None
+
+@dataclass
+class ImportStmt(Node):
+    name: str
+
 # expressions
 @dataclass
-class Number:
+class Number(Node):
     value: float | int
 
 @dataclass
-class String:
+class String(Node):
     value: str
 
 @dataclass
-class Bool:
+class Bool(Node):
     value: bool
 
 @dataclass
-class Null:
+class Null(Node):
     value: None = None
 
 @dataclass
-class Var:
+class Var(Node):
     name: str
+    slot: int = _slot()
 
 @dataclass
-class Unary:
+class Unary(Node):
     op: str
     right: Any
 
 @dataclass
-class Binary:
+class Binary(Node):
     left: Any
     op: str
     right: Any
+    # direct path for two plain numbers, from interpreter.FAST_OPS (set by kid_pgo)
+    fast: Any = field(default=None, kw_only=True, repr=False, compare=False)
 
 @dataclass
-class Call:
+class Call(Node):
     callee: Any
     args: List[Any]
+    # the builtin this call always reaches, filled in by resolver.resolve()
+    native: Any = field(default=None, kw_only=True, repr=False, compare=False)
+
+@dataclass
+class ListLit(Node):
+    items: List[Any]
+
+@dataclass
+class Index(Node):
+    target: Any
+    index: Any
+
+def children(node):
+    if isinstance(node, Program):
+        return list(node.statements)
+    if isinstance(node, (LetStmt, AssignStmt)):
+        return [node.value]
+    if isinstance(node, ExprStmt):
+        return [node.expr]
+    if isinstance(node, IfStmt):
+        return [node.cond, *node.then_body, *(node.else_body or [])]
+    if isinstance(node, WhileStmt):
+        return [node.cond, *node.body]
+    if isinstance(node, RepeatStmt):
+        return [node.count, *node.body]
+    if isinstance(node, FunStmt):
+        return list(node.body)
+    if isinstance(node, ReturnStmt):
+        return [] if node.value is None else [node.value]
+    if isinstance(node, Unary):
+        return [node.right]
+    if isinstance(node, Binary):
+        return [node.left, node.right]
+    if isinstance(node, Call):
+        return [node.callee, *node.args]
+    if isinstance(node, ListLit):
+        return list(node.items)
+    if isinstance(node, Index):
+        return [node.target, node.index]
+    return []
+
+def walk(node):
+    # Pre-order, iterative so very deep expressions do not hit the recursion limit.
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        yield n
+        stack.extend(reversed(children(n)))
 
 def dump(node, indent=0):
     pad = "  " * indent
@@ -128,6 +215,23 @@ def dump(node, indent=0):
         out.append(f"{pad})")
         return "\n".join(out)
 
+    if isinstance(node, FunStmt):
+        out = [f"{pad}{t}(name={node.name!r}, params={node.params!r}"]
+        out.append(f"{pad}  body=[")
+        for s in node.body:
+            out.append(dump(s, indent + 2))
+        out.append(f"{pad}  ]")
+        out.append(f"{pad})")
+        return "\n".join(out)
+
+    if isinstance(node, ImportStmt):
+        return f"{pad}{t}({node.name!r})"
+
+    if isinstance(node, ReturnStmt):
+        if node.value is None:
+            return f"{pad}{t}()"
+        return f"{pad}{t}(\n{dump(node.value, indent+1)}\n{pad})"
+
     if isinstance(node, (Number, String, Bool, Null, Var)):
         if isinstance(node, Null):
             return f"{pad}{t}()"
@@ -157,4 +261,19 @@ def dump(node, indent=0):
         out.append(f"{pad})")
         return "\n".join(out)
 
+    if isinstance(node, ListLit):
+        out = [f"{pad}{t}(["]
+        for item in node.items:
+            out.append(dump(item, indent + 1))
+        out.append(f"{pad}])")
+        return "\n".join(out)
+
+    if isinstance(node, Index):
+        return (
+            f"{pad}{t}(\n"
+            f"{dump(node.target, indent+1)}\n"
+            f"{dump(node.index, indent+1)}\n"
+            f"{pad})"
+        )
+
     return f"{pad}{t}({node!r})"
@@ -0,0 +1,47 @@
+import os, sys, time, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+from kid_lexer import lex
+from parser import Parser
+from interpreter import Interpreter
+from kid_parallel import ParallelInterpreter
+from workloads import nested_loops
+
+# Times the nested_loops workload (a counter and a sum in a repeat) run
+# sequentially and split across 1, 2, 4, ... processes.
+#   python bench/parallel_repeat.py [iterations] [max_jobs]
+# Both runs must print the same total; the speedup column is sequential time
+# over parallel time.
+
+def time_run(program, interp):
+    interp.write = lambda text: out.append(text)
+    out = []
+    t0 = time.perf_counter()
+    interp.run(program)
+    return time.perf_counter() - t0, "".join(out)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    iterations = int(argv[0]) if argv else 2_000_000
+    max_jobs = int(argv[1]) if len(argv) > 1 else (os.cpu_count() or 1)
+
+    src, _ = nested_loops(iterations * 16)
+    program = Parser(lex(src)).parse()
+    seq, expected = time_run(program, Interpreter())
+    print(f"{'jobs':>6} {'seconds':>9} {'speedup':>8}")
+    print(f"{'seq':>6} {seq:>9.3f} {1.0:>8.2f}")
+    jobs = 1
+    while jobs <= max_jobs:
+        t, got = time_run(program, ParallelInterpreter(jobs=jobs))
+        if got != expected:
+            print(f"jobs={jobs} printed {got!r}, expected {expected!r}")
+            return 1
+        print(f"{jobs:>6} {t:>9.3f} {seq / t:>8.2f}")
+        jobs *= 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+import sys, time, pathlib, statistics
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+from kid_lexer import lex
+from parser import Parser
+from interpreter import Interpreter
+from kid_pgo import PGORecorder, apply_profile
+from workloads import nested_loops
+
+# Steady-state time of a run with and without a recorded profile.
+#   python bench/pgo_speedup.py [repeats]
+# Each program is recorded once, then timed `repeats` times cold (no hints)
+# and with the profile applied; both must print the same thing.
+
+BRANCHY = """
+let steps = 0
+let n = 0
+repeat 3000 times
+  n = n + 1
+  let x = n
+  while x > 1 do
+    let half = floor(x / 2)
+    if half * 2 == x then
+      x = half
+    else
+      x = 3 * x + 1
+    end
+    steps = steps + 1
+  end
+end
+say(steps)
+"""
+
+PROGRAMS = {
+    "nested_loops": nested_loops(16 * 300_000)[0],
+    "collatz": BRANCHY,
+}
+
+def run(src, profile=None):
+    program = Parser(lex(src)).parse()
+    interp = Interpreter()
+    out = []
+    interp.write = out.append
+    if profile is not None:
+        apply_profile(program, profile, interp.env.values)
+    t0 = time.perf_counter()
+    interp.run(program)
+    return time.perf_counter() - t0, "".join(out)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    repeats = int(argv[0]) if argv else 5
+    print(f"{'program':>14} {'cold s':>8} {'pgo s':>8} {'speedup':>8}")
+    for name, src in PROGRAMS.items():
+        rec = PGORecorder()
+        rec.write = lambda text: None
+        rec.run(Parser(lex(src)).parse())
+        cold, warm = [], []
+        for _ in range(repeats):
+            t, expected = run(src)
+            cold.append(t)
+            t, got = run(src, rec.profile)
+            warm.append(t)
+            if got != expected:
+                print(f"{name}: pgo run printed {got!r}, expected {expected!r}")
+                return 1
+        c, w = statistics.median(cold), statistics.median(warm)
+        print(f"{name:>14} {c:>8.3f} {w:>8.3f} {c / w:>8.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+import sys, time, pathlib
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+import interpreter
+from kid_lexer import lex
+from parser import Parser
+from workloads import string_build
+
+# Shows how `s = s + "x"` loops scale with and without ropes.
+#   python bench/rope_scaling.py [start_iterations] [doublings]
+# With ropes the time per iteration stays flat as the loop grows; with plain
+# strings (ROPE_MIN raised out of reach) it grows with the string length.
+
+def time_run(iterations):
+    src, _ = string_build(iterations * 8)
+    program = Parser(lex(src)).parse()
+    t0 = time.perf_counter()
+    interp = interpreter.Interpreter()
+    interp.write = lambda text: None
+    interp.run(program)
+    return time.perf_counter() - t0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    start = int(argv[0]) if argv else 25000
+    doublings = int(argv[1]) if len(argv) > 1 else 4
+
+    default_min = interpreter.ROPE_MIN
+    print(f"{'iterations':>10} {'rope s':>9} {'us/iter':>8} {'plain s':>9} {'us/iter':>8}")
+    n = start
+    for _ in range(doublings):
+        interpreter.ROPE_MIN = default_min
+        rope = time_run(n)
+        interpreter.ROPE_MIN = float("inf")
+        plain = time_run(n)
+        print(f"{n:>10} {rope:>9.3f} {rope / n * 1e6:>8.2f} {plain:>9.3f} {plain / n * 1e6:>8.2f}")
+        n *= 2
+    interpreter.ROPE_MIN = default_min
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+import sys, os, io, json, time, argparse, pathlib, platform, statistics, subprocess, tempfile, contextlib
+
+HERE = pathlib.Path(__file__).resolve().parent
+ROOT = HERE.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(HERE))
+
+from kid_lexer import lex
+from parser import Parser
+from interpreter import Interpreter
+from workloads import WORKLOADS
+
+# Benchmark harness.
+#   python bench/run_bench.py                       # quick sizes, all workloads
+#   python bench/run_bench.py --sizes 1K,1M,100M -w straight_line
+#   python bench/run_bench.py --compare bench/baseline.json --threshold 0.15
+#   python bench/run_bench.py --save-baseline       # refresh bench/baseline.json
+#
+# Each (workload, size) is timed per phase (lex, parse, run) in-process and
+# end to end through kidlang.py. Medians are compared against the baseline;
+# any phase slower than baseline * (1 + threshold) is a regression and makes
+# the script exit with status 1.
+
+KIDLANG = ROOT / "kidlang.py"
+UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+def parse_size(text):
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+def _time(fn, warmup, repeat):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {"median": statistics.median(samples), "min": min(samples), "samples": samples}
+
+def _run_quiet(program, stdin_text):
+    old_stdin = sys.stdin
+    sys.stdin = io.StringIO(stdin_text)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            Interpreter().run(program)
+    finally:
+        sys.stdin = old_stdin
+
+def bench_one(name, size, warmup, repeat, end_to_end=True):
+    src, stdin_text = WORKLOADS[name](size)
+    tokens = lex(src)
+    program = Parser(tokens).parse()
+
+    phases = {
+        "lex": _time(lambda: lex(src), warmup, repeat),
+        "parse": _time(lambda: Parser(tokens).parse(), warmup, repeat),
+        "run": _time(lambda: _run_quiet(program, stdin_text), warmup, repeat),
+    }
+
+    if end_to_end:
+        with tempfile.TemporaryDirectory() as tmp:
+            prog = pathlib.Path(tmp) / f"{name}.kid"
+            prog.write_text(src, encoding="utf-8")
+
+            def e2e():
+                subprocess.run(
+                    [sys.executable, str(KIDLANG), str(prog)],
+                    input=stdin_text, text=True, check=True,
+                    stdout=subprocess.DEVNULL,
+                )
+            phases["end_to_end"] = _time(e2e, min(warmup, 1), repeat)
+
+    return {
+        "workload": name,
+        "size": size,
+        "source_bytes": len(src),
+        "tokens": len(tokens),
+        "phases": phases,
+    }
+
+def compare(results, baseline, threshold, min_time=0.001):
+    base = {(r["workload"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = base.get((r["workload"], r["size"]))
+        if b is None:
+            continue
+        for phase, t in r["phases"].items():
+            bt = b["phases"].get(phase)
+            if bt is None or bt["median"] < min_time:
+                continue  # too short to measure reliably
+            ratio = t["median"] / bt["median"]
+            t["vs_baseline"] = ratio
+            if ratio > 1 + threshold:
+                regressions.append((r["workload"], r["size"], phase, ratio))
+    return regressions
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="run_bench.py")
+    ap.add_argument("-w", "--workload", action="append", choices=sorted(WORKLOADS),
+                    help="workload to run (repeatable, default: all)")
+    ap.add_argument("--sizes", default="1K,64K", help="comma separated, e.g. 1K,1M,100M")
+    ap.add_argument("--warmup", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--no-e2e", action="store_true", help="skip the kidlang.py subprocess runs")
+    ap.add_argument("-o", "--output", default=str(HERE / "results.json"))
+    ap.add_argument("--compare", metavar="BASELINE", help="baseline JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.10,
+                    help="allowed slowdown before a phase counts as a regression (0.10 = 10%%)")
+    ap.add_argument("--min-time", type=float, default=0.001,
+                    help="ignore phases whose baseline median is below this many seconds")
+    ap.add_argument("--save-baseline", action="store_true", help="write results to bench/baseline.json")
+    args = ap.parse_args(argv)
+
+    names = args.workload or sorted(WORKLOADS)
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+
+    results = []
+    for name in names:
+        for size in sizes:
+            r = bench_one(name, size, args.warmup, args.repeat, not args.no_e2e)
+            results.append(r)
+            summary = "  ".join(f"{p}={t['median'] * 1000:.2f}ms" for p, t in r["phases"].items())
+            print(f"{name:<14} {size:>10}  {summary}", flush=True)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+    regressions = []
+    if args.compare:
+        baseline = json.loads(pathlib.Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold, args.min_time)
+        report["threshold"] = args.threshold
+        report["regressions"] = [
+            {"workload": w, "size": s, "phase": p, "ratio": r} for w, s, p, r in regressions
+        ]
+        for w, s, p, r in regressions:
+            print(f"REGRESSION {w} size={s} {p}: {r:.2f}x baseline", file=sys.stderr)
+
+    out = pathlib.Path(HERE / "baseline.json" if args.save_baseline else args.output)
+    out.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"wrote {out}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
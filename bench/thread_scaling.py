@@ -0,0 +1,87 @@
+import io, os, sys, time, pathlib, threading
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from kid_lexer import lex
+from parser import Parser
+from interpreter import Interpreter, THREAD_STACK_SIZE
+
+# Stress test for running many interpreters on threads of one process.
+#   python bench/thread_scaling.py [runs_per_thread] [max_threads]
+# One parsed Program is shared by every thread; each run gets its own
+# Interpreter with its own stdin/stdout, and every run's output is checked
+# against a single-threaded run. On a free-threaded (no-GIL) CPython build
+# throughput should grow almost linearly with threads up to the core count;
+# with the GIL it stays flat, which is what the "gil" line is there to show.
+
+SOURCE = """
+fun fib(n)
+  if n < 2 then
+    return n
+  end
+  return fib(n - 1) + fib(n - 2)
+end
+let name = ask("name? ")
+let total = 0
+let i = 0
+repeat 3000 times
+  i = i + 1
+  total = total + mod(i * i, 7)
+end
+let s = ""
+repeat 200 times
+  s = s + name
+end
+say(name, total, fib(15), len(s), sum(range(1, 101)))
+"""
+
+def run_once(program, k):
+    out = io.StringIO()
+    Interpreter(stdin=io.StringIO(f"kid{k}\n"), stdout=out).run(program)
+    return out.getvalue()
+
+def worker(program, runs, start, expected, failures):
+    for k in range(start, start + runs):
+        got = run_once(program, k % 10)
+        if got != expected[k % 10]:
+            failures.append((k, got))
+
+def measure(program, threads, runs, expected):
+    failures = []
+    pool = [threading.Thread(target=worker, args=(program, runs, t * runs, expected, failures))
+            for t in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return threads * runs / elapsed, failures
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    runs = int(argv[0]) if argv else 20
+    max_threads = int(argv[1]) if len(argv) > 1 else (os.cpu_count() or 1)
+
+    threading.stack_size(THREAD_STACK_SIZE)
+    program = Parser(lex(SOURCE)).parse()
+    expected = [run_once(program, k) for k in range(10)]
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"python {sys.version.split()[0]}  gil={'on' if gil else 'off'}  cpus={os.cpu_count()}")
+    print(f"{'threads':>7} {'runs/s':>9} {'scaling':>8} {'per thread':>10}")
+    base = None
+    threads = 1
+    while threads <= max_threads:
+        rate, failures = measure(program, threads, runs, expected)
+        if failures:
+            k, got = failures[0]
+            print(f"run {k} with {threads} threads printed {got!r}")
+            return 1
+        base = base or rate
+        print(f"{threads:>7} {rate:>9.1f} {rate / base:>8.2f} {rate / base / threads:>10.2f}")
+        threads *= 2
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import random
+
+# Synthetic KidLang workloads. Every generator takes a target size in bytes of
+# source (or, for loop-bound workloads, work roughly proportional to it) and
+# returns (source, stdin_text). Output is deterministic for a given size.
+
+def _fill(lines, size):
+    out = []
+    total = 0
+    i = 0
+    while total < size:
+        ln = lines(i)
+        out.append(ln)
+        total += len(ln) + 1
+        i += 1
+    return "\n".join(out) + "\n"
+
+def deep_expr(size, depth=40):
+    # Nested parentheses stress the recursive-descent parser and eval_expr.
+    # Depth stays well under Python's recursion limit; size adds more lines.
+    def line(i):
+        inner = str(i % 10)
+        for d in range(depth):
+            op = "+-*"[d % 3]
+            inner = f"({inner} {op} {d % 7 + 1})"
+        return f"let e{i % 100} = {inner}"
+    return _fill(line, size), ""
+
+def straight_line(size):
+    def line(i):
+        if i < 10:
+            return f"let v{i} = {i}"
+        return f"let v{i % 500 + 10} = v{i % 10} + {i % 97} * 2 - v{(i * 7) % 10}"
+    return _fill(line, size), ""
+
+def _repeat_nest(iterations, body):
+    # repeat is capped at 200000 per loop, so bigger counts use an outer loop.
+    outer = max(1, iterations // 100000)
+    inner = max(1, iterations // outer)
+    return (
+        f"repeat {outer} times\n"
+        f"  repeat {inner} times\n"
+        + "".join(f"    {b}\n" for b in body)
+        + "  end\n"
+        "end\n"
+    )
+
+def nested_loops(size):
+    n = max(1, size // 16)
+    src = "let t = 0\nlet i = 0\n"
+    src += _repeat_nest(n, ["i = i + 1", "t = t + i * 3 - i / 2"])
+    src += "say(t)\n"
+    return src, ""
+
+def string_build(size):
+    n = max(1, size // 8)
+    src = 'let s = ""\n' + _repeat_nest(n, ['s = s + "x"']) + "say(s == \"\")\n"
+    return src, ""
+
+def output_heavy(size):
+    n = max(1, size // 16)
+    src = "let i = 0\n" + _repeat_nest(n, ["i = i + 1", 'say("line", i)'])
+    return src, ""
+
+def ask_heavy(size):
+    n = max(1, size // 16)
+    rnd = random.Random(n)
+    stdin = "".join(f"{rnd.randint(0, 999)}\n" for _ in range(n))
+    src = 'let t = ""\n' + _repeat_nest(n, ['let a = ask("")', "t = a"]) + "say(t)\n"
+    return src, stdin
+
+def list_math(size):
+    # The same sum as nested_loops, done with list builtins instead of a loop.
+    n = max(1, size // 16)
+    src = f"let xs = range(1, {n + 1})\nsay(sum(xs * 3 - xs / 2))\n"
+    return src, ""
+
+WORKLOADS = {
+    "deep_expr": deep_expr,
+    "straight_line": straight_line,
+    "nested_loops": nested_loops,
+    "string_build": string_build,
+    "output_heavy": output_heavy,
+    "ask_heavy": ask_heavy,
+    "list_math": list_math,
+}
@@ -1,12 +1,29 @@
+import sys, math, operator
+from array import array
+from itertools import repeat
+from collections import OrderedDict
+
 import ast_nodes as A
+from parser import ParseError
+from kid_modules import MODULES, find_module
+from kid_natives import NativeFunction
+from resolver import resolve
 
 class RuntimeErrorKid(Exception):
     pass
 
+LOOP_LIMIT = 200000
+
+INFINITE_LOOP_MSG = (
+    "This loop looks infinite.\n"
+    "Fix: make sure something changes inside the loop so it can stop."
+)
+
 class Env:
     def __init__(self, parent=None):
         self.parent = parent
         self.values = {}
+        self.sizes = {}  # name -> bytes counted in the interpreter's heap
 
     def define(self, name, value):
         self.values[name] = value
@@ -33,6 +50,316 @@ class Env:
             f"Fix: write `let {name} = ...` first, then use `{name}` later."
         )
 
+# Strings built with `+` past ROPE_MIN characters become Ropes: the pieces are
+# kept in a list and only joined when the text is needed (say, ==, stringify).
+# Ropes made from the same start share the list; each one owns its first `n`
+# pieces, so appending to an older rope copies instead of changing a newer one.
+# That makes `s = s + "x"` in a loop linear instead of quadratic.
+# Every piece costs a list slot and a str header, so each ROPE_RUN pieces
+# appended after `start` are joined into one (on a fresh list: older ropes
+# keep theirs), and a flattened rope keeps only the flat text.
+ROPE_MIN = 256
+ROPE_RUN = 256
+ROPE_PIECE = 57  # bytes per piece on top of its text
+
+class Rope:
+    __slots__ = ("parts", "n", "length", "flat", "start")
+
+    def __init__(self, parts, n, length, start=0):
+        self.parts = parts
+        self.n = n
+        self.length = length
+        self.flat = None
+        self.start = start
+
+    def concat(self, s):
+        # Both rewrites keep this rope's text and move it onto the new list,
+        # so kid_trace still sees the result as this rope plus `s`.
+        if len(self.parts) != self.n:
+            self.parts, self.n, self.start = [str(self)], 1, 1
+        elif self.n - self.start >= ROPE_RUN:
+            start = self.start
+            parts = self.parts[:start]
+            parts.append("".join(self.parts[start:self.n]))
+            self.parts, self.n, self.start = parts, len(parts), len(parts)
+        parts = self.parts
+        parts.append(s)
+        return Rope(parts, len(parts), self.length + len(s), self.start)
+
+    def size(self):
+        return self.length + ROPE_PIECE * self.n
+
+    def __str__(self):
+        if self.flat is None:
+            parts = self.parts
+            self.flat = "".join(parts if len(parts) == self.n else parts[:self.n])
+            self.parts, self.n, self.start = [self.flat], 1, 1
+        return self.flat
+
+    def __len__(self):
+        return self.length
+
+    def __eq__(self, other):
+        if isinstance(other, (str, Rope)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return repr(str(self))
+
+# Lists are immutable. A list of only numbers keeps them as doubles in a NumPy
+# array (or array('d') without NumPy) so the list builtins and elementwise
+# math run in native code; any other list is a tuple. Numbers read back out
+# are floats, which say() already prints without ".0" when they are whole.
+# Whole numbers past 2**53 would change as doubles (or not fit at all), so a
+# list holding one stays a tuple and keeps them exactly.
+_VEC_OPS = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv}
+EXACT_INT = 1 << 53
+
+_numpy = []  # [the module, or None without it] once first asked for
+
+def numpy():
+    # Imported on the first list of numbers: loading it takes longer than
+    # most programs run, and most never make a list.
+    if not _numpy:
+        try:
+            import numpy as np
+        except ImportError:  # lists fall back to array('d')
+            np = None
+        _numpy.append(np)
+    return _numpy[0]
+
+def _exact_double(v):
+    t = type(v)
+    return t is float or t is int and -EXACT_INT <= v <= EXACT_INT
+
+def _doubles(values):
+    np = numpy()
+    if np is not None:
+        return np.array(values, dtype=float)
+    return array("d", values)
+
+class KidList:
+    __slots__ = ("items", "numeric")
+
+    def __init__(self, items, numeric):
+        self.items = items
+        self.numeric = numeric
+
+    @classmethod
+    def of(cls, values):
+        if all(map(_exact_double, values)):
+            return cls(_doubles(values), True)
+        return cls(tuple(str(v) if isinstance(v, Rope) else v for v in values), False)
+
+    def size(self):
+        if self.numeric:
+            return 8 * len(self.items)
+        return sum(len(v) + 8 if isinstance(v, str) else 8 for v in self.items)
+
+    def get(self, i):
+        v = self.items[_position(i, len(self.items))]
+        return float(v) if self.numeric else v
+
+    def tolist(self):
+        if self.numeric:
+            return [float(v) for v in self.items]
+        return list(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __eq__(self, other):
+        if isinstance(other, KidList):
+            return self.tolist() == other.tolist()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self.tolist()))
+
+    def __repr__(self):
+        return f"KidList({self.tolist()!r})"
+
+def _position(i, n):
+    if type(i) is float and i.is_integer():
+        i = int(i)
+    if type(i) is not int or not 0 <= i < n:
+        raise RuntimeErrorKid(
+            f"There are {n} items here, so the position must be a whole number from 0 to {n - 1}.\n"
+            "Fix: the first item is at [0] and the last at [len(...) - 1]."
+        )
+    return i
+
+def _vector_op(op, a, b):
+    fn = _VEC_OPS[op]
+    x = a.items if isinstance(a, KidList) else _num(a)
+    y = b.items if isinstance(b, KidList) else _num(b)
+    for side in (a, b):
+        if isinstance(side, KidList) and not side.numeric:
+            raise RuntimeErrorKid(
+                f"Math with {op} on a list needs a list of numbers only.\n"
+                "Fix: take the text out of the list first."
+            )
+        # The list holds doubles, so a bigger whole number would be rounded.
+        if not isinstance(side, KidList) and not _exact_double(_num(side)):
+            raise RuntimeErrorKid(
+                f"Math with {op} on a list works with whole numbers up to {EXACT_INT}.\n"
+                "Fix: use a smaller number, or do the math one item at a time in a loop."
+            )
+    if isinstance(a, KidList) and isinstance(b, KidList) and len(a) != len(b):
+        raise RuntimeErrorKid(
+            f"These lists have different lengths ({len(a)} and {len(b)}).\n"
+            "Fix: math between two lists needs them to be the same length."
+        )
+    if op == "/" and (0 in y if isinstance(b, KidList) else y == 0):
+        raise RuntimeErrorKid("Division by zero.\nFix: do not divide by 0.")
+    np = numpy()
+    if np is not None:
+        return KidList(np.asarray(fn(x, y), dtype=float), True)
+    xs = x if isinstance(a, KidList) else repeat(x)
+    ys = y if isinstance(b, KidList) else repeat(y)
+    return KidList(array("d", map(fn, xs, ys)), True)
+
+def _numbers_only(name, xs):
+    if isinstance(xs, KidList) and not xs.numeric and all(type(v) in FAST_TYPES for v in xs.items):
+        raise RuntimeErrorKid(
+            f"{name}(...) works with whole numbers up to {EXACT_INT}, and this list has a bigger one.\n"
+            "Fix: use smaller numbers, or add them up with a loop."
+        )
+    if not isinstance(xs, KidList) or not xs.numeric:
+        raise RuntimeErrorKid(
+            f"{name}(...) needs a list of numbers.\n"
+            f"Fix: call it like {name}([3, 1, 2])."
+        )
+    return xs.items
+
+# Heap accounting. Sizes are estimates in bytes: one per character of text (a
+# rope counts its full length even when it shares pieces with another) and
+# eight per list item. Every string `*` and `+`, list literal, list builtin
+# and list math checks its result size against max_heap before building it,
+# and the values held in variables must fit together too. Whole numbers get
+# a cap instead, checked by + - and *: just under the most digits Python will
+# print (sys.get_int_max_str_digits(), 4300 unless changed), about 14k bits.
+# Numbers too big to mix with decimals get the same message.
+DEFAULT_MAX_HEAP = 64 * 1024 * 1024
+
+def _int_bits():
+    digits = sys.get_int_max_str_digits() if hasattr(sys, "get_int_max_str_digits") else 0
+    return int(((digits or 4300) - 1) * math.log2(10))
+
+MAX_INT_BITS = _int_bits()
+BIG_INT = 1 << MAX_INT_BITS  # whole numbers must stay strictly between the two
+NEG_BIG_INT = -BIG_INT
+
+BIG_NUMBER_MSG = (
+    "That number is too big.\n"
+    "Fix: check your loop is not making the same number bigger again and again."
+)
+
+SIZED = (str, Rope, KidList)
+
+# Direct paths for a Binary on two plain numbers (bools and text excluded by
+# FAST_TYPES), with the same results and errors as the general code below.
+# kid_pgo puts them on operators a profile saw only numbers in.
+FAST_TYPES = frozenset((int, float))
+
+def _fast_add(a, b):
+    try:
+        r = a + b
+    except OverflowError:
+        raise RuntimeErrorKid(BIG_NUMBER_MSG)
+    if NEG_BIG_INT < r < BIG_INT or type(r) is not int:
+        return r
+    raise RuntimeErrorKid(BIG_NUMBER_MSG)
+
+def _fast_sub(a, b):
+    try:
+        r = a - b
+    except OverflowError:
+        raise RuntimeErrorKid(BIG_NUMBER_MSG)
+    if NEG_BIG_INT < r < BIG_INT or type(r) is not int:
+        return r
+    raise RuntimeErrorKid(BIG_NUMBER_MSG)
+
+def _fast_mul(a, b):
+    if type(a) is int and type(b) is int and a.bit_length() + b.bit_length() > MAX_INT_BITS:
+        raise RuntimeErrorKid(BIG_NUMBER_MSG)
+    try:
+        return a * b
+    except OverflowError:
+        raise RuntimeErrorKid(BIG_NUMBER_MSG)
+
+def _fast_div(a, b):
+    if b == 0:
+        raise RuntimeErrorKid("Division by zero.\nFix: do not divide by 0.")
+    try:
+        return a / b
+    except OverflowError:
+        raise RuntimeErrorKid(BIG_NUMBER_MSG)
+
+FAST_OPS = {
+    "+": _fast_add, "-": _fast_sub, "*": _fast_mul, "/": _fast_div,
+    "==": operator.eq, "!=": operator.ne,
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+
+def _size(v):
+    if isinstance(v, (KidList, Rope)):
+        return v.size()
+    if isinstance(v, str):
+        return len(v)
+    return 0
+
+def _heap_error(size):
+    return RuntimeErrorKid(
+        f"Your program tried to use too much memory (about {_mb(size)}).\n"
+        "Fix: use shorter text or lists, or repeat them fewer times."
+    )
+
+def _mb(size):
+    return f"{size / (1024 * 1024):.1f} MB" if size >= 1024 * 1024 else f"{size} bytes"
+
+# User functions. A call's locals live in a plain list (its "frame") indexed
+# by the slots the parser gave each name; frames are cleared and reused from a
+# small pool per function. `return` stores its value in self._ret and hands
+# RETURN back up through exec_stmt/exec_block to the call, so leaving a
+# function never raises. With memo=True, results of pure functions (no
+# globals, no say/ask, only calling other pure functions by name) are cached,
+# and all caches together hold at most max_heap bytes of text and lists.
+RETURN = object()
+UNSET = object()
+CALL_LIMIT = 1000
+RECURSION_LIMIT = 30 * CALL_LIMIT  # Python frames per call grow with interpreter mixins
+FRAME_POOL = 16
+MEMO_SIZE = 4096
+
+class Function:
+    __slots__ = ("name", "params", "body", "slots", "env", "blank", "pool", "pure", "memo")
+
+    def __init__(self, stmt, env):
+        self.name = stmt.name
+        self.params = stmt.params
+        self.body = stmt.body
+        self.slots = stmt.slots
+        self.env = env  # globals of the program or module that defined it
+        self.blank = [UNSET] * len(stmt.slots)
+        self.pool = []
+        self.pure = None
+        self.memo = None
+
+    def __repr__(self):
+        return f"<fun {self.name}>"
+
+_TYPE_NAMES = {"Rope": "str", "Function": "fun", "KidList": "list", "NoneType": "null",
+               "int": "number", "float": "number"}
+
+def _type_name(v):
+    name = type(v).__name__
+    return _TYPE_NAMES.get(name, name)
+
 def _truthy(v):
     if v is None:
         return False
@@ -42,6 +369,10 @@ def _truthy(v):
         return v != 0
     if isinstance(v, str):
         return v != ""
+    if isinstance(v, Rope):
+        return v.length != 0
+    if isinstance(v, KidList):
+        return len(v.items) != 0
     return True
 
 def _num(v):
@@ -49,29 +380,91 @@ def _num(v):
         return int(v)
     if isinstance(v, (int, float)):
         return v
-    raise RuntimeErrorKid(f"Expected a number, but got {type(v).__name__}.")
+    raise RuntimeErrorKid(f"Expected a number, but got {_type_name(v)}.")
+
+def _repeat_count(v):
+    n_int = int(_num(v))
+    if n_int < 0:
+        raise RuntimeErrorKid("repeat needs a positive number (0 or more).")
+    if n_int > LOOP_LIMIT:
+        raise RuntimeErrorKid("repeat number is too big for safety.")
+    return n_int
+
+def set_traps(program, on):
+    for node in A.walk(program):
+        if isinstance(node, A.Node):
+            node.trap = on
+
+# Thread safety: every Interpreter keeps its state to itself, so separate
+# instances can run on separate threads at once, also without the GIL. What
+# they share is read-only once running: the builtins (kid_stdlib), parsed
+# modules (kid_modules.MODULES, locked) and any Program handed to several of
+# them, which resolve() finishes under a lock before the first run. Step mode
+# and the debugger set `trap` on the nodes, so give those their own Program.
+# Each call of a fun nests a few Python calls; threads started with
+# threading.stack_size(THREAD_STACK_SIZE) have room for CALL_LIMIT of them.
+THREAD_STACK_SIZE = 64 * 1024 * 1024
 
 class Interpreter:
-    def __init__(self, step=False):
+    def __init__(self, step=False, max_heap=DEFAULT_MAX_HEAP, memo=False, import_path=(),
+                 stdin=None, stdout=None):
         self.env = Env()
         self.step = step
+        self.max_heap = max_heap
+        self.heap = 0
+        self.heap_peak = 0
+        self.memo = memo
+        self.frame = None
+        self.frame_fn = None
+        self.call_depth = 0
+        self._ret = None
+        self._local_sizes = None  # slot -> size, for the running call
+        self._memo_bytes = 0      # text and lists held by memo caches
+        self.import_path = list(import_path)
+        self.modules = {}     # module file -> its Env, once run
+        self._importing = []  # (file, name) of modules being run right now
+        self.stdin = stdin    # None: whatever sys.stdin/sys.stdout are at the time
+        self.stdout = stdout
+        if sys.getrecursionlimit() < RECURSION_LIMIT:
+            sys.setrecursionlimit(RECURSION_LIMIT)
         self._install_builtins()
 
     def _install_builtins(self):
-        def say(*args):
-            out = " ".join(self._stringify(a) for a in args)
-            print(out)
-            return None
+        from kid_stdlib import STDLIB  # it imports this module
+        STDLIB.install(self.env)
 
-        def ask(prompt=""):
-            if prompt is None:
-                prompt = ""
-            if not isinstance(prompt, str):
-                prompt = self._stringify(prompt)
-            return input(prompt)
+    # say/ask go through these two, so an embedding can send a program's
+    # output and input somewhere other than the process's stdout/stdin.
+    def write(self, text):
+        (self.stdout or sys.stdout).write(text)
 
-        self.env.define("say", ("builtin", say))
-        self.env.define("ask", ("builtin", ask))
+    def read_line(self, prompt):
+        line = self._readline(prompt)
+        if line is None:
+            raise RuntimeErrorKid(
+                "ask(...) wanted an answer, but there was no more input.\n"
+                "Fix: give the program one line of input for every ask(...)."
+            )
+        return line
+
+    def _readline(self, prompt):
+        # One line without its newline, or None at the end of the input.
+        if self.stdin is None and self.stdout is None:
+            try:
+                return input(prompt)
+            except EOFError:
+                return None
+        self.write(prompt)
+        (self.stdout or sys.stdout).flush()
+        line = (self.stdin or sys.stdin).readline()
+        if not line:
+            return None
+        return line[:-1] if line.endswith("\n") else line
+
+    def call_native(self, native, args):
+        if native.bound:
+            return native.fn(self, *args)
+        return native.fn(*args)
 
     def _stringify(self, v):
         if v is None:
@@ -82,50 +475,255 @@ class Interpreter:
             return "false"
         if isinstance(v, float) and v.is_integer():
             return str(int(v))
+        if isinstance(v, KidList):
+            return "[" + ", ".join(
+                f'"{x}"' if isinstance(x, str) else self._stringify(x) for x in v.tolist()
+            ) + "]"
         return str(v)
 
+    def _alloc(self, size):
+        if self.max_heap is not None and size > self.max_heap:
+            raise _heap_error(size)
+
+    def _account(self, sizes, key, val):
+        size = _size(val)
+        heap = self.heap - sizes.get(key, 0) + size
+        if self.max_heap is not None and heap > self.max_heap:
+            raise _heap_error(heap)
+        self.heap = heap
+        if heap > self.heap_peak:
+            self.heap_peak = heap
+        if size:
+            sizes[key] = size
+        else:
+            sizes.pop(key, None)
+
+    def _store_local(self, stmt, val):
+        sizes = self._local_sizes
+        if isinstance(val, SIZED) or (sizes and stmt.slot in sizes):
+            if sizes is None:
+                sizes = self._local_sizes = {}
+            self._account(sizes, stmt.slot, val)
+        self.frame[stmt.slot] = val
+
+    def call_function(self, fn, args):
+        if len(args) != len(fn.params):
+            shape = f"{fn.name}({', '.join(fn.params)})"
+            raise RuntimeErrorKid(
+                f"{fn.name} needs {len(fn.params)} value(s), but got {len(args)}.\n"
+                f"Fix: call it like {shape}."
+            )
+        memo = fn.memo
+        if memo is None and self.memo:
+            if fn.pure is None:
+                fn.pure = self._is_pure(fn, set())
+            if fn.pure:
+                memo = fn.memo = OrderedDict()
+        if memo is not None:
+            key = (*args, *map(type, args))
+            hit = memo.get(key)
+            if hit is not None:
+                memo.move_to_end(key)
+                return hit[0]
+
+        if self.call_depth >= CALL_LIMIT:
+            raise RuntimeErrorKid(
+                f"{fn.name} called functions more than {CALL_LIMIT} deep.\n"
+                "Fix: make sure your function stops calling itself at some point."
+            )
+        frame = fn.pool.pop() if fn.pool else fn.blank[:]
+        frame[:len(args)] = args
+        saved = self.env, self.frame, self.frame_fn, self._local_sizes
+        self.env = fn.env
+        self.frame = frame
+        self.frame_fn = fn
+        self._local_sizes = None
+        self.call_depth += 1
+        try:
+            # Parameters hold values too; count them like any other local.
+            for slot, val in enumerate(args):
+                if isinstance(val, SIZED):
+                    if self._local_sizes is None:
+                        self._local_sizes = {}
+                    self._account(self._local_sizes, slot, val)
+            result = None
+            if self.exec_block(fn.body) is RETURN:
+                result = self._ret
+                self._ret = None
+        finally:
+            self.call_depth -= 1
+            if self._local_sizes:
+                self.heap -= sum(self._local_sizes.values())
+            self.env, self.frame, self.frame_fn, self._local_sizes = saved
+            frame[:] = fn.blank
+            if len(fn.pool) < FRAME_POOL:
+                fn.pool.append(frame)
+
+        if memo is not None:
+            self._memoize(memo, key, result)
+        return result
+
+    def _memoize(self, memo, key, result):
+        # Oldest entries of this function go first when there are too many or
+        # all caches together would hold more than max_heap.
+        size = _size(result) + sum(map(_size, key))
+        memo[key] = (result, size)
+        self._memo_bytes += size
+        limit = self.max_heap
+        while memo and (len(memo) > MEMO_SIZE or limit is not None and self._memo_bytes > limit):
+            self._memo_bytes -= memo.popitem(last=False)[1][1]
+
+    def _is_pure(self, fn, seen):
+        # Functions already being checked count as pure; only the function the
+        # check started from gets its answer cached.
+        seen.add(fn)
+        for node in A.walk(A.Program(fn.body)):
+            if isinstance(node, A.AssignStmt) and node.slot < 0:
+                return False
+            if isinstance(node, A.Call) and not (isinstance(node.callee, A.Var) and node.callee.slot < 0):
+                return False  # g(x) with g a parameter could be say
+            if isinstance(node, A.Var) and node.slot < 0:
+                other = fn.env.values.get(node.name)
+                if isinstance(other, NativeFunction) and other.pure:
+                    continue
+                if not isinstance(other, Function):
+                    return False
+                if other not in seen and not (other.pure if other.pure is not None
+                                              else self._is_pure(other, seen)):
+                    return False
+        return True
+
+    def _elementwise(self, op, left, right):
+        self._alloc(8 * len(left if isinstance(left, KidList) else right))
+        return _vector_op(op, left, right)
+
+    def _concat(self, left, right):
+        r = self._stringify(right)
+        if isinstance(left, Rope):
+            self._alloc(left.size() + len(r) + ROPE_PIECE)
+            return left.concat(r)
+        l = self._stringify(left)
+        self._alloc(len(l) + len(r))
+        if len(l) + len(r) < ROPE_MIN:
+            return l + r
+        return Rope([l, r], 2, len(l) + len(r))
+
     def run(self, program: A.Program):
+        resolve(program, self.env.values)
+        if self.step:
+            set_traps(program, True)
         try:
             for stmt in program.statements:
-                self._step(stmt)
+                if stmt.trap:
+                    self._trap(stmt)
                 self.exec_stmt(stmt)
         except RuntimeErrorKid as e:
             raise RuntimeErrorKid(str(e))
+        finally:
+            if self.step:
+                set_traps(program, False)
+
+    def _trap(self, stmt):
+        self._step(stmt)
 
     def _step(self, stmt):
         if not self.step:
             return
-        print("\n--- STEP ---")
+        self.write("\n--- STEP ---\n")
         try:
-            print(A.dump(stmt))
+            self.write(A.dump(stmt) + "\n")
         except Exception:
-            print(stmt)
-        print("vars:", self._env_snapshot())
-        input("Press Enter to run this step...")
+            self.write(f"{stmt}\n")
+        self.write(f"vars: {self._env_snapshot()}\n")
+        self._readline("Press Enter to run this step...")
+
+    def _import(self, name):
+        # Runs the module once per interpreter in a fresh Env that only has
+        # the builtins, then copies its names (except _private ones) in here.
+        path = find_module(name, self.import_path)
+        if path is None:
+            raise RuntimeErrorKid(
+                f'There is no module called "{name}".\n'
+                "Fix: check the spelling. Modules are .kid files in the program's folder or a --lib folder."
+            )
+        key = str(path)
+        if any(k == key for k, _ in self._importing):
+            chain = " -> ".join([n for _, n in self._importing] + [name])
+            raise RuntimeErrorKid(
+                f"These modules import each other in a circle: {chain}.\n"
+                "Fix: move the part they both need into a third module."
+            )
+        env = self.modules.get(key)
+        if env is None:
+            env = Env()
+            for k, v in self.env.values.items():
+                if isinstance(v, NativeFunction):
+                    env.values[k] = v
+            try:
+                program = MODULES.load(path)
+                resolve(program, env.values)
+            except (SyntaxError, ParseError) as e:
+                raise RuntimeErrorKid(f'In module "{name}": {e}')
+            saved = self.env, self.frame, self.frame_fn, self._local_sizes
+            self.env, self.frame, self.frame_fn, self._local_sizes = env, None, None, None
+            self._importing.append((key, name))
+            try:
+                self.exec_block(program.statements)
+            finally:
+                self._importing.pop()
+                self.env, self.frame, self.frame_fn, self._local_sizes = saved
+            self.modules[key] = env
+        for k, v in env.values.items():
+            if k.startswith("_") or isinstance(v, NativeFunction):
+                continue
+            self.env.define(k, v)
+
+    def _locals(self):
+        if self.frame is None:
+            return {}
+        return {k: v for k, v in zip(self.frame_fn.slots, self.frame) if v is not UNSET}
 
     def _env_snapshot(self):
         # shallow view of current env (kid-friendly)
         items = []
+        local = self._locals()
+        for k, v in local.items():
+            items.append(f"{k}={self._stringify(v)}")
         for k, v in self.env.values.items():
-            if isinstance(v, tuple) and len(v) == 2 and v[0] == "builtin":
-                items.append(f"{k}=<builtin>")
-            else:
+            if k in local:
+                continue
+            if not isinstance(v, NativeFunction):
                 items.append(f"{k}={self._stringify(v)}")
         return "{ " + ", ".join(items) + " }"
 
     def exec_block(self, statements):
         for s in statements:
-            self._step(s)
-            self.exec_stmt(s)
+            if s.trap:
+                self._trap(s)
+            if self.exec_stmt(s) is RETURN:
+                return RETURN
+        return None
 
     def exec_stmt(self, stmt):
         if isinstance(stmt, A.LetStmt):
             val = self.eval_expr(stmt.value)
+            if stmt.slot >= 0:
+                self._store_local(stmt, val)
+                return None
+            if isinstance(val, SIZED) or stmt.name in self.env.sizes:
+                self._account(self.env.sizes, stmt.name, val)
             self.env.define(stmt.name, val)
             return None
 
         if isinstance(stmt, A.AssignStmt):
             val = self.eval_expr(stmt.value)
+            if stmt.slot >= 0:
+                if self.frame[stmt.slot] is UNSET:
+                    raise RuntimeErrorKid(self.env._hint_undefined(stmt.name))
+                self._store_local(stmt, val)
+                return None
+            if isinstance(val, SIZED) or stmt.name in self.env.sizes:
+                self._account(self.env.sizes, stmt.name, val)
             self.env.assign(stmt.name, val)
             return None
 
@@ -134,35 +732,45 @@ class Interpreter:
 
         if isinstance(stmt, A.IfStmt):
             cond = self.eval_expr(stmt.cond)
-            if _truthy(cond):
-                self.exec_block(stmt.then_body)
+            likely = stmt.likely
+            if likely is not None and cond is likely:
+                taken = likely
+            else:
+                taken = _truthy(cond)
+            if taken:
+                return self.exec_block(stmt.then_body)
             else:
                 if stmt.else_body is not None:
-                    self.exec_block(stmt.else_body)
+                    return self.exec_block(stmt.else_body)
             return None
 
         if isinstance(stmt, A.WhileStmt):
             guard = 0
             while _truthy(self.eval_expr(stmt.cond)):
-                self.exec_block(stmt.body)
+                if self.exec_block(stmt.body) is RETURN:
+                    return RETURN
                 guard += 1
-                if guard > 200000:
-                    raise RuntimeErrorKid(
-                        "This loop looks infinite.\n"
-                        "Fix: make sure something changes inside the loop so it can stop."
-                    )
+                if guard > LOOP_LIMIT:
+                    raise RuntimeErrorKid(INFINITE_LOOP_MSG)
             return None
 
         if isinstance(stmt, A.RepeatStmt):
-            n = self.eval_expr(stmt.count)
-            n = _num(n)
-            n_int = int(n)
-            if n_int < 0:
-                raise RuntimeErrorKid("repeat needs a positive number (0 or more).")
-            if n_int > 200000:
-                raise RuntimeErrorKid("repeat number is too big for safety.")
+            n_int = _repeat_count(self.eval_expr(stmt.count))
             for _ in range(n_int):
-                self.exec_block(stmt.body)
+                if self.exec_block(stmt.body) is RETURN:
+                    return RETURN
+            return None
+
+        if isinstance(stmt, A.ReturnStmt):
+            self._ret = None if stmt.value is None else self.eval_expr(stmt.value)
+            return RETURN
+
+        if isinstance(stmt, A.FunStmt):
+            self.env.define(stmt.name, Function(stmt, self.env))
+            return None
+
+        if isinstance(stmt, A.ImportStmt):
+            self._import(stmt.name)
             return None
 
         raise RuntimeErrorKid(f"Unknown statement: {type(stmt).__name__}")
@@ -177,6 +785,11 @@ class Interpreter:
         if isinstance(expr, A.Null):
             return None
         if isinstance(expr, A.Var):
+            if expr.slot >= 0:
+                v = self.frame[expr.slot]
+                if v is UNSET:
+                    raise RuntimeErrorKid(self.env._hint_undefined(expr.name))
+                return v
             return self.env.get(expr.name)
 
         if isinstance(expr, A.Unary):
@@ -189,34 +802,63 @@ class Interpreter:
 
         if isinstance(expr, A.Binary):
             left = self.eval_expr(expr.left)
-
-            if expr.op == "and":
-                return self.eval_expr(expr.right) if _truthy(left) else left
-            if expr.op == "or":
-                return left if _truthy(left) else self.eval_expr(expr.right)
-
-            right = self.eval_expr(expr.right)
+            fast = expr.fast
+            if fast is not None:
+                right = self.eval_expr(expr.right)
+                if type(left) in FAST_TYPES and type(right) in FAST_TYPES:
+                    return fast(left, right)
+            else:
+                if expr.op == "and":
+                    return self.eval_expr(expr.right) if _truthy(left) else left
+                if expr.op == "or":
+                    return left if _truthy(left) else self.eval_expr(expr.right)
+                right = self.eval_expr(expr.right)
 
             if expr.op == "+":
-                if isinstance(left, str) or isinstance(right, str):
-                    return self._stringify(left) + self._stringify(right)
-                return _num(left) + _num(right)
+                if isinstance(left, SIZED) or isinstance(right, SIZED):
+                    if isinstance(left, (str, Rope)) or isinstance(right, (str, Rope)):
+                        return self._concat(left, right)
+                    return self._elementwise("+", left, right)
+                try:
+                    r = _num(left) + _num(right)
+                except OverflowError:
+                    raise RuntimeErrorKid(BIG_NUMBER_MSG)
+                if NEG_BIG_INT < r < BIG_INT or type(r) is not int:
+                    return r
+                raise RuntimeErrorKid(BIG_NUMBER_MSG)
 
             if expr.op == "-":
-                return _num(left) - _num(right)
+                if type(left) is KidList or type(right) is KidList:
+                    return self._elementwise("-", left, right)
+                try:
+                    r = _num(left) - _num(right)
+                except OverflowError:
+                    raise RuntimeErrorKid(BIG_NUMBER_MSG)
+                if NEG_BIG_INT < r < BIG_INT or type(r) is not int:
+                    return r
+                raise RuntimeErrorKid(BIG_NUMBER_MSG)
 
             if expr.op == "*":
+                if type(left) is KidList or type(right) is KidList:
+                    return self._elementwise("*", left, right)
+                if isinstance(left, Rope):
+                    left = str(left)
+                if isinstance(right, Rope):
+                    right = str(right)
                 if isinstance(left, str) and isinstance(right, (int, float)):
-                    return left * int(_num(right))
+                    n = int(_num(right))
+                    self._alloc(len(left) * n)
+                    return left * n
                 if isinstance(right, str) and isinstance(left, (int, float)):
-                    return right * int(_num(left))
-                return _num(left) * _num(right)
+                    n = int(_num(left))
+                    self._alloc(len(right) * n)
+                    return right * n
+                return _fast_mul(_num(left), _num(right))
 
             if expr.op == "/":
-                r = _num(right)
-                if r == 0:
-                    raise RuntimeErrorKid("Division by zero.\nFix: do not divide by 0.")
-                return _num(left) / r
+                if type(left) is KidList or type(right) is KidList:
+                    return self._elementwise("/", left, right)
+                return _fast_div(_num(left), _num(right))
 
             if expr.op == "==":
                 return left == right
@@ -233,17 +875,40 @@ class Interpreter:
 
             raise RuntimeErrorKid(f"Unknown operator {expr.op!r}")
 
+        if isinstance(expr, A.ListLit):
+            values = [self.eval_expr(item) for item in expr.items]
+            self._alloc(sum(_size(v) + 8 for v in values))
+            return KidList.of(values)
+
+        if isinstance(expr, A.Index):
+            target = self.eval_expr(expr.target)
+            i = self.eval_expr(expr.index)
+            if isinstance(target, KidList):
+                return target.get(i)
+            if isinstance(target, (str, Rope)):
+                text = str(target)
+                return text[_position(i, len(text))]
+            raise RuntimeErrorKid(
+                f"Only lists and text have items to pick with [...], not {_type_name(target)}."
+            )
+
         if isinstance(expr, A.Call):
+            native = expr.native
+            if native is not None:  # bound by resolve(); arity already checked
+                return self.call_native(native, [self.eval_expr(a) for a in expr.args])
             callee = self.eval_expr(expr.callee)
             args = [self.eval_expr(a) for a in expr.args]
 
-            if isinstance(callee, tuple) and len(callee) == 2 and callee[0] == "builtin":
-                fn = callee[1]
-                return fn(*args)
+            if type(callee) is NativeFunction:
+                if not callee.accepts(len(args)):
+                    raise RuntimeErrorKid(callee.arity_error(len(args)))
+                return self.call_native(callee, args)
+            if isinstance(callee, Function):
+                return self.call_function(callee, args)
 
             raise RuntimeErrorKid(
                 "You tried to call something that is not a function.\n"
-                "Fix: call built-ins like say(...) or ask(...)."
+                "Fix: call built-ins like say(...) or ask(...), or a fun you wrote."
             )
 
         raise RuntimeErrorKid(f"Unknown expression: {type(expr).__name__}")
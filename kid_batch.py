@@ -0,0 +1,150 @@
+import sys, os, json, time, argparse, pathlib, threading, queue
+
+from kid_pool import Worker
+from kid_cache import ResultCache, run_key
+from interpreter import DEFAULT_MAX_HEAP
+
+# Batch mode: run many .kid programs across a pool of worker processes.
+#   python kidlang.py batch submissions/ --jobs 8 --timeout 5 --mem 256
+#   python kidlang.py batch manifest.jsonl -o results.jsonl
+#
+# A directory is scanned for *.kid files; a stdin fixture next to a program
+# is picked up as <name>.in. A manifest is JSON lines with "program" and an
+# optional "stdin" path (relative to the manifest) or "stdin_text".
+
+FIXTURE_SUFFIX = ".in"
+MB = 1024 * 1024
+
+def collect_jobs(target: pathlib.Path):
+    if target.is_dir():
+        for prog in sorted(target.rglob("*.kid")):
+            fixture = prog.with_suffix(FIXTURE_SUFFIX)
+            yield {
+                "program": str(prog),
+                "stdin_path": str(fixture) if fixture.exists() else None,
+            }
+        return
+
+    base = target.parent
+    with target.open(encoding="utf-8") as f:
+        for ln, raw in enumerate(f, 1):
+            raw = raw.strip()
+            if not raw or raw.startswith("#"):
+                continue
+            try:
+                entry = json.loads(raw)
+            except json.JSONDecodeError as e:
+                raise SystemExit(f"{target}:{ln}: bad manifest line ({e})")
+            job = {"program": str(base / entry["program"]), "stdin_path": None}
+            if "stdin" in entry:
+                job["stdin_path"] = str(base / entry["stdin"])
+            if "stdin_text" in entry:
+                job["stdin_text"] = entry["stdin_text"]
+            yield job
+
+def load_job(job):
+    src = pathlib.Path(job["program"]).read_text(encoding="utf-8")
+    if job.get("stdin_text") is not None:
+        stdin = job["stdin_text"]
+    elif job.get("stdin_path"):
+        stdin = pathlib.Path(job["stdin_path"]).read_text(encoding="utf-8")
+    else:
+        stdin = ""
+    return {"source": src, "stdin": stdin}
+
+def _drive(worker, jobs, results, timeout, cache):
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            try:
+                payload = load_job(job)
+            except OSError as e:
+                result = {"stdout": "", "error": f"Could not read input: {e}",
+                          "exit": 2, "timings": {}}
+            else:
+                t0 = time.perf_counter()
+                key = run_key(payload["source"], payload["stdin"]) if cache is not None else None
+                result = cache.get(key) if key is not None else None
+                if result is not None:
+                    result["cached"] = True
+                    result["timings"] = {"wall": time.perf_counter() - t0}
+                else:
+                    result = worker.run(payload, timeout)
+                    if key is not None:
+                        cache.put(key, result)
+            result = {"program": job["program"], **result}
+            results.put(result)
+    finally:
+        worker.close()
+
+def run_batch(jobs, out, workers=None, timeout=None, mem_mb=None, cache=None,
+              max_heap=DEFAULT_MAX_HEAP, import_path=()):
+    workers = workers or os.cpu_count() or 1
+    pending = queue.Queue()
+    results = queue.Queue()
+
+    total = 0
+    for job in jobs:
+        pending.put(job)
+        total += 1
+    for _ in range(workers):
+        pending.put(None)
+
+    threads = []
+    for _ in range(min(workers, max(total, 1))):
+        t = threading.Thread(
+            target=_drive,
+            args=(Worker(mem_mb, max_heap, import_path), pending, results, timeout, cache),
+            daemon=True,
+        )
+        t.start()
+        threads.append(t)
+
+    failed = 0
+    for _ in range(total):
+        result = results.get()
+        if result["exit"] != 0:
+            failed += 1
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+    for t in threads:
+        t.join()
+    return failed
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="kidlang.py batch")
+    ap.add_argument("target", help="directory of .kid files or a JSON-lines manifest")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    ap.add_argument("--timeout", type=float, default=10.0, help="wall-clock seconds per program")
+    ap.add_argument("--mem", type=int, default=None, help="memory cap per worker in MB")
+    ap.add_argument("--max-heap", type=float, default=DEFAULT_MAX_HEAP / MB,
+                    help="text one program may hold, in MB")
+    ap.add_argument("--lib", action="append", default=[], metavar="DIR",
+                    help="folder of modules programs may import (repeatable)")
+    ap.add_argument("--cache-size", type=int, default=4096, help="cached results to keep (0 disables)")
+    ap.add_argument("-o", "--output", default=None, help="write JSON lines here instead of stdout")
+    args = ap.parse_args(argv)
+
+    target = pathlib.Path(args.target)
+    if not target.exists():
+        raise SystemExit(f"Not found: {target}")
+
+    cache = ResultCache(args.cache_size) if args.cache_size > 0 else None
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        failed = run_batch(collect_jobs(target), out, args.jobs, args.timeout, args.mem, cache,
+                           int(args.max_heap * MB), args.lib)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if cache is not None:
+        st = cache.stats()
+        print(
+            f"cache: {st['hits']} hits, {st['misses']} misses "
+            f"({st['hit_rate']:.1%} hit rate), {st['evictions']} evicted",
+            file=sys.stderr,
+        )
+    return 1 if failed else 0
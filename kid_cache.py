@@ -0,0 +1,93 @@
+import hashlib, threading
+from collections import OrderedDict
+
+from kid_lexer import lex
+
+# KidLang programs cannot touch files, the network or the clock, so a run is
+# fully decided by the program's tokens and the lines fed to ask(). Results
+# are cached under a hash of both, so resubmitted solutions that differ only
+# in spacing, blank lines or comments are answered without running them.
+# Programs that import modules also depend on those files and are not cached.
+
+def token_key(src: str):
+    h = hashlib.sha256()
+    prev_newline = True  # leading blank lines do not matter either
+    for t in lex(src):
+        if t.kind == "NEWLINE":
+            if prev_newline:
+                continue
+            prev_newline = True
+        else:
+            prev_newline = False
+        h.update(t.kind.encode())
+        h.update(b"\x00")
+        h.update(t.lexeme.encode("utf-8", "surrogatepass"))
+        h.update(b"\x01")
+    return h.hexdigest()
+
+def stdin_key(stdin_text: str):
+    lines = stdin_text.split("\n")
+    if lines and lines[-1] == "":
+        lines.pop()
+    h = hashlib.sha256()
+    for ln in lines:
+        h.update(ln.encode("utf-8", "surrogatepass"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+def run_key(src: str, stdin_text: str = ""):
+    try:
+        prog = token_key(src)
+        if "import" in src and any(t.kind == "KW" and t.lexeme == "import" for t in lex(src)):
+            return None
+    except SyntaxError:
+        return None
+    return prog + ":" + stdin_key(stdin_text)
+
+def cacheable(result):
+    # Lex and parse errors quote line:col, which differ between programs with
+    # the same tokens, and timeouts/crashes depend on the machine.
+    return result["exit"] in (0, 1) and "parse" in result.get("timings", {})
+
+class ResultCache:
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry)
+
+    def put(self, key, result):
+        if key is None or self.max_entries <= 0 or not cacheable(result):
+            return
+        entry = {"stdout": result["stdout"], "error": result["error"], "exit": result["exit"]}
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
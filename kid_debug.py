@@ -0,0 +1,241 @@
+import copy, json, socket
+
+import ast_nodes as A
+from kid_lexer import lex
+from parser import Parser, ParseError
+from interpreter import Interpreter, RuntimeErrorKid, set_traps, _truthy
+from kid_natives import NativeFunction
+
+# Breakpoint debugger (`kidlang.py prog.kid --debug PORT`).
+#
+# The program connects to 127.0.0.1:PORT and talks JSON lines on that socket,
+# so its own say/ask keep using stdin/stdout. It stops before the first
+# statement and then waits for commands:
+#   {"cmd": "break", "line": 5}                       line breakpoint
+#   {"cmd": "break", "line": 5, "cond": "x == 5000"}  only when cond is true
+#   {"cmd": "break", "line": 5, "hits": 5000}         only on the 5000th time
+#   {"cmd": "clear", "line": 5}
+#   {"cmd": "continue"} / {"cmd": "step"} / {"cmd": "next"} / {"cmd": "out"}
+#   {"cmd": "vars"} / {"cmd": "eval", "expr": "x * 2"} / {"cmd": "quit"}
+# and reports:
+#   {"event": "stopped", "reason": "entry|breakpoint|step", "line": 5, "vars": {...}}
+#   {"event": "breakpoint", "line": 5, "verified": true}
+#   {"event": "vars", ...} / {"event": "value", ...} / {"event": "error", ...}
+#   {"event": "exited", "error": null}
+#
+# Depth is nesting inside blocks; statements inside a fun count one call level
+# (CALL_DEPTH) deeper per active call, so `next` steps over calls and `out`
+# returns to the caller.
+#
+# Only statements that could stop have their `trap` flag set: the lines with
+# breakpoints while running, every statement while stepping. All the others
+# run through the normal interpreter loop with no extra calls.
+
+class DebugChannel:
+    def __init__(self, rfile, wfile):
+        self.rfile = rfile
+        self.wfile = wfile
+
+    @classmethod
+    def connect(cls, port, host="127.0.0.1"):
+        sock = socket.create_connection((host, port))
+        return cls(sock.makefile("r", encoding="utf-8"), sock.makefile("w", encoding="utf-8"))
+
+    def send(self, obj):
+        try:
+            self.wfile.write(json.dumps(obj) + "\n")
+            self.wfile.flush()
+        except OSError:
+            pass
+
+    def recv(self):
+        try:
+            line = self.rfile.readline()
+        except OSError:
+            return None
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return {"cmd": "?"}
+
+CALL_DEPTH = 1000
+
+class Breakpoint:
+    def __init__(self, line, cond=None, cond_src=None, hits=None):
+        self.line = line
+        self.cond = cond
+        self.cond_src = cond_src
+        self.hits = hits
+        self.count = 0
+        self.scoped = {}  # fun -> cond with that fun's locals in its frame
+
+class DebugInterpreter(Interpreter):
+    def __init__(self, *args, debug=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.channel = debug
+        self.breakpoints = {}
+        self._mode = "step"
+        self._from_depth = 0
+        self._depth = {}
+        self._by_line = {}
+        self._stmts = []
+
+    def _index(self, stmts, depth):
+        for s in stmts:
+            self._depth[id(s)] = depth
+            self._by_line.setdefault(s.line, []).append(s)
+            self._stmts.append(s)
+            if isinstance(s, A.IfStmt):
+                self._index(s.then_body, depth + 1)
+                self._index(s.else_body or [], depth + 1)
+            elif isinstance(s, (A.WhileStmt, A.RepeatStmt)):
+                self._index(s.body, depth + 1)
+            elif isinstance(s, A.FunStmt):
+                self._index(s.body, 0)
+
+    def run(self, program):
+        self._index(program.statements, 0)
+        self._program = program
+        self._reason = "entry"
+        self._apply_traps()
+        error = None
+        try:
+            super().run(program)
+        except RuntimeErrorKid as e:
+            error = str(e)
+            raise
+        finally:
+            set_traps(program, False)
+            self.channel.send({"event": "exited", "error": error})
+
+    def _apply_traps(self):
+        if self._mode == "run":
+            for s in self._stmts:
+                s.trap = s.line in self.breakpoints
+        else:
+            for s in self._stmts:
+                s.trap = True
+
+    def _vars(self):
+        out = {}
+        for k, v in self.env.values.items():
+            if isinstance(v, NativeFunction):
+                continue
+            out[k] = self._stringify(v)
+        for k, v in self._locals().items():
+            out[k] = self._stringify(v)
+        return out
+
+    def _trap(self, stmt):
+        super()._trap(stmt)
+        d = self._depth.get(id(stmt), 0) + self.call_depth * CALL_DEPTH
+        mode = self._mode
+        reason = None
+        if mode == "step":
+            reason = self._reason
+        elif mode == "next" and d <= self._from_depth:
+            reason = "step"
+        elif mode == "out" and d < self._from_depth:
+            reason = "step"
+
+        bp = self.breakpoints.get(stmt.line)
+        if bp is not None and self._hit(bp) and reason is None:
+            reason = "breakpoint"
+        if reason is not None:
+            self._pause(stmt, d, reason)
+
+    def _hit(self, bp):
+        if bp.cond is not None:
+            try:
+                if not _truthy(self.eval_expr(self._scoped(bp.cond, bp.scoped))):
+                    return False
+            except RuntimeErrorKid as e:
+                self.channel.send({"event": "error", "line": bp.line,
+                                   "message": f"breakpoint condition failed: {e}"})
+                return True
+        bp.count += 1
+        return bp.hits is None or bp.count == bp.hits
+
+    def _pause(self, stmt, depth, reason):
+        ch = self.channel
+        ch.send({"event": "stopped", "reason": reason, "line": stmt.line,
+                 "depth": depth, "vars": self._vars()})
+        while True:
+            msg = ch.recv()
+            if msg is None:
+                # Debugger went away: drop breakpoints and run to the end.
+                self.breakpoints.clear()
+                self._mode = "run"
+                self._apply_traps()
+                return
+            cmd = msg.get("cmd")
+
+            if cmd in ("continue", "step", "next", "out"):
+                self._mode = "run" if cmd == "continue" else cmd
+                self._from_depth = depth
+                self._reason = "step"
+                self._apply_traps()
+                return
+
+            if cmd == "break":
+                self._set_breakpoint(msg)
+            elif cmd == "clear":
+                self.breakpoints.pop(int(msg.get("line", 0)), None)
+                ch.send({"event": "cleared", "line": msg.get("line")})
+            elif cmd == "vars":
+                ch.send({"event": "vars", "vars": self._vars()})
+            elif cmd == "eval":
+                try:
+                    expr = self._scoped(self._parse_expr(msg.get("expr", "")))
+                    ch.send({"event": "value", "expr": msg.get("expr"),
+                             "value": self._stringify(self.eval_expr(expr))})
+                except (SyntaxError, ParseError, RuntimeErrorKid) as e:
+                    ch.send({"event": "error", "message": str(e)})
+            elif cmd == "quit":
+                raise RuntimeErrorKid("Stopped by the debugger.")
+            else:
+                ch.send({"event": "error", "message": f"unknown command {cmd!r}"})
+
+    def _parse_expr(self, src):
+        p = Parser(lex(src))
+        expr = p.expression()
+        p.skip_newlines()
+        if not p.at_end():
+            t = p.peek()
+            raise ParseError(f"Unexpected {t.lexeme!r} in expression")
+        return expr
+
+    def _scoped(self, expr, cache=None):
+        # A condition or eval is parsed on its own, so every name in it reads
+        # a global. Inside a fun, the names that fun has locals for are
+        # pointed at its frame instead, on a copy kept per fun in `cache`.
+        fn = self.frame_fn
+        if fn is None:
+            return expr
+        scoped = cache.get(fn) if cache is not None else None
+        if scoped is None:
+            scoped = copy.deepcopy(expr)
+            slots = {name: i for i, name in enumerate(fn.slots)}
+            for n in A.walk(scoped):
+                if isinstance(n, A.Var):
+                    n.slot = slots.get(n.name, -1)
+            if cache is not None:
+                cache[fn] = scoped
+        return scoped
+
+    def _set_breakpoint(self, msg):
+        line = int(msg.get("line", 0))
+        cond_src = msg.get("cond")
+        cond = None
+        if cond_src:
+            try:
+                cond = self._parse_expr(cond_src)
+            except (SyntaxError, ParseError) as e:
+                self.channel.send({"event": "error", "line": line, "message": str(e)})
+                return
+        hits = msg.get("hits")
+        self.breakpoints[line] = Breakpoint(line, cond, cond_src, int(hits) if hits else None)
+        self.channel.send({"event": "breakpoint", "line": line,
+                           "verified": line in self._by_line})
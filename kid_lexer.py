@@ -3,12 +3,14 @@ from tokens import Token
 KEYWORDS = {
     "let","if","then","else","end","while","do","fun","return",
     "true","false","null","and","or","not",
-    "repeat","times",
+    "repeat","times","import",
 }
 
 SINGLE = {
     "(": "LPAREN",
     ")": "RPAREN",
+    "[": "LBRACKET",
+    "]": "RBRACKET",
     ",": "COMMA",
     "+": "PLUS",
     "-": "MINUS",
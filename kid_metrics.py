@@ -0,0 +1,159 @@
+import json, time
+from contextlib import contextmanager
+
+import ast_nodes as A
+from kid_lexer import lex
+from parser import Parser
+from interpreter import Interpreter, Env, RuntimeErrorKid, SIZED, _size
+
+# Metrics registry for one or more KidLang runs.
+#
+#   m = Metrics()
+#   run_with_metrics(src, m)
+#   m.to_json()        # what `kidlang.py --metrics out.json` writes
+#   m.to_prometheus()  # text exposition format
+#
+# Nothing here is wired into the plain Interpreter: counting is done by
+# MeteredInterpreter and MeteredEnv, so runs without metrics pay nothing.
+
+class Metrics:
+    def __init__(self):
+        self.counters = {}
+        self.timers = {}   # name -> [seconds, count]
+        self.gauges = {}   # name -> highest value seen
+
+    def inc(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def peak(self, name, value):
+        if name not in self.gauges or value > self.gauges[name]:
+            self.gauges[name] = value
+
+    def add_time(self, name, seconds):
+        t = self.timers.get(name)
+        if t is None:
+            self.timers[name] = [seconds, 1]
+        else:
+            t[0] += seconds
+            t[1] += 1
+
+    @contextmanager
+    def timer(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - t0)
+
+    def to_dict(self):
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "timers": {k: {"seconds": v[0], "count": v[1]} for k, v in sorted(self.timers.items())},
+            "gauges": dict(sorted(self.gauges.items())),
+        }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, prefix="kidlang_"):
+        out = []
+        for k, v in sorted(self.counters.items()):
+            out.append(f"# TYPE {prefix}{k}_total counter")
+            out.append(f"{prefix}{k}_total {v}")
+        for k, (secs, n) in sorted(self.timers.items()):
+            out.append(f"# TYPE {prefix}{k}_seconds summary")
+            out.append(f"{prefix}{k}_seconds_sum {secs}")
+            out.append(f"{prefix}{k}_seconds_count {n}")
+        for k, v in sorted(self.gauges.items()):
+            out.append(f"# TYPE {prefix}{k} gauge")
+            out.append(f"{prefix}{k} {v}")
+        return "\n".join(out) + "\n"
+
+def value_size(v):
+    if isinstance(v, SIZED):
+        return _size(v)
+    return 1
+
+class MeteredEnv(Env):
+    def __init__(self, metrics, parent=None):
+        super().__init__(parent)
+        self.metrics = metrics
+
+    def get(self, name):
+        m = self.metrics
+        m.inc("env_lookups")
+        env = self
+        depth = 0
+        while env is not None:
+            if name in env.values:
+                if depth:
+                    m.inc("env_parent_hops", depth)
+                m.peak("env_max_depth", depth)
+                return env.values[name]
+            env = env.parent
+            depth += 1
+        raise RuntimeErrorKid(self._hint_undefined(name))
+
+class MeteredInterpreter(Interpreter):
+    def __init__(self, *args, metrics=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.metrics.peak("env_max_depth", 0)
+        self.metrics.peak("max_value_size", 0)
+        env = MeteredEnv(self.metrics, self.env.parent)
+        env.values = self.env.values
+        self.env = env
+        self._loop_bodies = []
+
+    def call_native(self, native, args):
+        m = self.metrics
+        m.inc("builtin_calls")
+        m.inc(f"builtin_calls_{native.name}")
+        return super().call_native(native, args)
+
+    def call_function(self, fn, args):
+        self.metrics.inc("function_calls")
+        self.metrics.peak("call_depth", self.call_depth + 1)
+        return super().call_function(fn, args)
+
+    def exec_block(self, statements):
+        if self._loop_bodies and statements is self._loop_bodies[-1]:
+            self.metrics.inc("loop_iterations")
+        return super().exec_block(statements)
+
+    def exec_stmt(self, stmt):
+        m = self.metrics
+        m.inc("statements")
+        if isinstance(stmt, (A.WhileStmt, A.RepeatStmt)):
+            self._loop_bodies.append(stmt.body)
+            try:
+                return super().exec_stmt(stmt)
+            finally:
+                self._loop_bodies.pop()
+        result = super().exec_stmt(stmt)
+        if isinstance(stmt, (A.LetStmt, A.AssignStmt)) and stmt.slot >= 0:
+            m.peak("max_value_size", value_size(self.frame[stmt.slot]))
+        elif isinstance(stmt, (A.LetStmt, A.AssignStmt)):
+            env = self.env
+            while env is not None and stmt.name not in env.values:
+                env = env.parent
+            if env is not None:
+                m.peak("max_value_size", value_size(env.values[stmt.name]))
+        return result
+
+def run_with_metrics(src, metrics=None, interp=None):
+    m = metrics if metrics is not None else Metrics()
+    with m.timer("lex"):
+        tokens = lex(src)
+    m.inc("tokens", len(tokens))
+    with m.timer("parse"):
+        program = Parser(tokens).parse()
+    m.inc("ast_nodes", sum(1 for _ in A.walk(program)))
+    if interp is None:
+        interp = MeteredInterpreter(metrics=m)
+    try:
+        with m.timer("run"):
+            interp.run(program)
+    finally:
+        m.peak("heap_peak", interp.heap_peak)
+    return m
@@ -0,0 +1,60 @@
+import re, hashlib, pathlib, threading
+from collections import OrderedDict
+
+from kid_lexer import lex
+from parser import Parser
+
+# `import "name"` support.
+#
+# A module name is a plain word (letters, digits, _), looked up as name.kid
+# in each directory of the import path in order. Anything that could walk out
+# of those directories (slashes, dots, symlinks pointing elsewhere) is refused.
+#
+# Parsed modules are shared by every interpreter in the process, keyed by a
+# hash of the file's contents: a worker that runs thousands of programs
+# importing the same helpers parses each helper once. The AST is read-only
+# while running, so sharing it is safe; each run still executes the module
+# in its own Env.
+
+NAME_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+def find_module(name, import_path):
+    if not NAME_RE.fullmatch(name):
+        return None
+    for d in import_path:
+        root = pathlib.Path(d).resolve()
+        p = (root / f"{name}.kid").resolve()
+        if p.parent == root and p.is_file():
+            return p
+    return None
+
+class ModuleCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # sha256 of source -> Program
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def load(self, path):
+        src = pathlib.Path(path).read_text(encoding="utf-8")
+        key = hashlib.sha256(src.encode("utf-8", "surrogatepass")).hexdigest()
+        with self.lock:
+            program = self.entries.get(key)
+            if program is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return program
+            self.misses += 1
+        program = Parser(lex(src)).parse()  # outside the lock; a race only parses twice
+        with self.lock:
+            self.entries[key] = program
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return program
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+MODULES = ModuleCache()
@@ -0,0 +1,69 @@
+# Host-provided (Python) functions that KidLang programs can call.
+#
+#   reg = Registry()
+#
+#   @reg.native("shout", 1, pure=True, types=("text",))
+#   def shout(s):
+#       return s.upper() + "!"
+#
+#   reg.install(interp.env)
+#
+# `arity` is the number of arguments, or (least, most) with most=VARIADIC for
+# "any number". `types` names what each argument should be ("number", "text",
+# "list", "bool" or "any"); the last entry covers any extra arguments. Pure
+# natives always give the same result for the same arguments and do nothing
+# else, so calls with constant arguments may be worked out before the program
+# runs. `bound` natives get the running interpreter as their first argument,
+# for output, input and heap checks.
+
+VARIADIC = float("inf")
+
+class NativeFunction:
+    __slots__ = ("name", "fn", "min_args", "max_args", "pure", "types", "bound")
+
+    def __init__(self, name, fn, arity, pure=False, types=None, bound=False):
+        self.name = name
+        self.fn = fn
+        self.min_args, self.max_args = arity if isinstance(arity, tuple) else (arity, arity)
+        self.pure = pure
+        self.types = tuple(types or ())
+        self.bound = bound
+
+    def accepts(self, n):
+        return self.min_args <= n <= self.max_args
+
+    def arity_error(self, n):
+        if self.max_args == VARIADIC:
+            want = f"at least {self.min_args}"
+        elif self.min_args == self.max_args:
+            want = str(self.min_args)
+        else:
+            want = f"{self.min_args} to {self.max_args}"
+        return f"{self.name} needs {want} value(s), but got {n}."
+
+    def type_of(self, i):
+        if not self.types:
+            return "any"
+        return self.types[min(i, len(self.types) - 1)]
+
+    def __repr__(self):
+        return f"<builtin {self.name}>"
+
+class Registry:
+    def __init__(self):
+        self.natives = {}
+
+    def add(self, native):
+        self.natives[native.name] = native
+        return native
+
+    def native(self, name, arity, pure=False, types=None, bound=False):
+        def deco(fn):
+            self.add(NativeFunction(name, fn, arity, pure, types, bound))
+            return fn
+        return deco
+
+    def install(self, env):
+        # a snapshot, so natives added on another thread cannot break the loop
+        for name, native in list(self.natives.items()):
+            env.define(name, native)
@@ -0,0 +1,419 @@
+import os, pickle, operator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import ast_nodes as A
+from kid_natives import NativeFunction
+from kid_stdlib import STDLIB
+from resolver import resolve
+from interpreter import (
+    Interpreter, Function, Rope, KidList, RuntimeErrorKid, SIZED,
+    LOOP_LIMIT, _repeat_count, _fast_add, _fast_mul,
+)
+
+# Data-parallel `repeat`.
+#
+# A top-level `repeat N times` loop is split into chunks that run in
+# worker processes when every name its body changes is one of:
+#   private   always set at the top of the body before it is read   let d = x * x
+#   counter   i = i + step, the same number of times every turn     i = i + 1
+#   sum       only ever  t = t + e  or  t = t - e
+#   product   only ever  p = p * e
+#   min/max   only ever  if e > best then best = e end   (or <, <=, >=)
+# and the body only calls pure funs and builtins (no say or ask). The workers
+# get copies of the values the body reads; afterwards counters, sums and
+# products are combined and private names keep the last turn's value. Any
+# other loop, or one too small to pay for the processes, runs as usual, and
+# so does a loop whose values turn out not to fit (a counter that is not a
+# whole number, a sum that became text, ...).
+#
+# Answers are exactly what a plain run gives: sums and products are combined
+# chunk by chunk, so they must stay whole numbers (decimal ones could come out
+# different in the last digits); a chunk whose sum or product is a decimal
+# makes the whole loop run as usual.
+#
+# It starts worker processes, so it is for the command line; a host running
+# interpreters on its own threads should use the plain Interpreter.
+
+PARALLEL_MIN_WORK = 500_000  # estimated node visits before a pool pays off
+CHUNKS_PER_JOB = 2
+PLAIN = (bool, int, float, str, type(None), Rope, KidList)
+COMPARE = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+IDENTITY = {"sum": 0, "product": 1}
+
+class _Sequential(Exception):
+    pass
+
+class RepeatPlan:
+    def __init__(self, body):
+        self.body = body
+        self.privates = []
+        self.counters = {}    # name -> (times per turn, negative for -, step expression)
+        self.reductions = {}  # name -> "sum" | "product" | ("compare", op, value_on_left)
+        self.reads = set()    # names the body reads but never changes
+        self.calls = set()    # names the body calls
+        self.cost = 0
+
+def _mentions(node, name):
+    for n in A.walk(node):
+        if isinstance(n, A.Var) and n.name == name:
+            return True
+        if isinstance(n, (A.LetStmt, A.AssignStmt)) and n.name == name:
+            return True
+    return False
+
+def _uses(node, name):
+    return sum(1 for n in A.walk(node)
+               if isinstance(n, A.Var) and n.name == name
+               or isinstance(n, (A.LetStmt, A.AssignStmt)) and n.name == name)
+
+def _is_var(node, name):
+    return isinstance(node, A.Var) and node.name == name
+
+def _nodes(node):
+    return sum(1 for _ in A.walk(node))
+
+def _cost(stmts):
+    c = 0
+    for s in stmts:
+        if isinstance(s, A.RepeatStmt):
+            n = s.count.value if isinstance(s.count, A.Number) else 10
+            c += _nodes(s.count) + max(int(n), 0) * _cost(s.body)
+        elif isinstance(s, A.WhileStmt):
+            c += 10 * (_nodes(s.cond) + _cost(s.body))
+        elif isinstance(s, A.IfStmt):
+            c += _nodes(s.cond) + max(_cost(s.then_body), _cost(s.else_body or []))
+        else:
+            c += _nodes(s)
+    return c
+
+def _private(name, body):
+    # The first top-level statement that mentions `name` sets it from values
+    # that do not include it.
+    for s in body:
+        if isinstance(s, (A.LetStmt, A.AssignStmt)) and s.name == name:
+            return not _mentions(s.value, name)
+        if _mentions(s, name):
+            return False
+    return False
+
+def _counter(name, writes, changed):
+    # One `i = i + step` that runs the same number of times every turn (not
+    # under an if or while), with a step that does not change in the loop.
+    if len(writes) != 1 or writes[0][1] is None:
+        return None
+    v = writes[0][0].value
+    if not isinstance(v, A.Binary) or v.op not in ("+", "-"):
+        return None
+    if _is_var(v.left, name):
+        step = v.right
+    elif v.op == "+" and _is_var(v.right, name):
+        step = v.left
+    else:
+        return None
+    if isinstance(step, A.Number) or isinstance(step, A.Var) and step.name not in changed:
+        return (writes[0][1] if v.op == "+" else -writes[0][1]), step
+    return None
+
+def _plus_one(e, name, ops):
+    # e is `name` plus (or times) things that do not involve it: t + a - b
+    if _is_var(e, name):
+        return True
+    if not isinstance(e, A.Binary) or e.op not in ops:
+        return False
+    if _plus_one(e.left, name, ops) and not _mentions(e.right, name):
+        return True
+    return e.op != "-" and _plus_one(e.right, name, ops) and not _mentions(e.left, name)
+
+def _update_kind(stmt, name):
+    if _plus_one(stmt.value, name, ("+", "-")):
+        return "sum"
+    if _plus_one(stmt.value, name, ("*",)):
+        return "product"
+    return None
+
+def _compare_kind(stmt, name):
+    # if e > best then best = e end, in any of the four orders and directions
+    if not isinstance(stmt, A.IfStmt) or stmt.else_body is not None or len(stmt.then_body) != 1:
+        return None
+    inner, cond = stmt.then_body[0], stmt.cond
+    if not isinstance(inner, (A.LetStmt, A.AssignStmt)) or inner.name != name:
+        return None
+    if not isinstance(cond, A.Binary) or cond.op not in COMPARE or _mentions(inner.value, name):
+        return None
+    if _is_var(cond.right, name) and cond.left == inner.value:
+        return ("compare", cond.op, True)
+    if _is_var(cond.left, name) and cond.right == inner.value:
+        return ("compare", cond.op, False)
+    return None
+
+def _reduction(name, body):
+    kinds, covered, sites = set(), set(), 0
+    nodes = list(A.walk(A.Program(body)))
+    for n in nodes:
+        kind = _compare_kind(n, name)
+        if kind is not None:
+            kinds.add(kind)
+            covered.add(id(n.then_body[0]))
+            sites += 1
+    for n in nodes:
+        if isinstance(n, (A.LetStmt, A.AssignStmt)) and n.name == name and id(n) not in covered:
+            kind = _update_kind(n, name)
+            if kind is None:
+                return None
+            kinds.add(kind)
+            sites += 1
+    # each site reads the name once and sets it once; any other use is a dependence
+    if len(kinds) != 1 or _uses(A.Program(body), name) != 2 * sites:
+        return None
+    return kinds.pop()
+
+def plan_repeat(stmt):
+    # What the loop body's shape allows; values are checked each time it runs.
+    body = stmt.body
+    writes = {}
+
+    def scan(stmts, times):
+        # times: how often each of these runs per turn, None if it depends
+        for s in stmts:
+            if isinstance(s, (A.LetStmt, A.AssignStmt)):
+                writes.setdefault(s.name, []).append((s, times))
+            elif isinstance(s, A.IfStmt):
+                scan(s.then_body, None)
+                scan(s.else_body or [], None)
+            elif isinstance(s, A.RepeatStmt):
+                n = s.count.value if isinstance(s.count, A.Number) else -1
+                fixed = times is not None and 0 <= n <= LOOP_LIMIT
+                scan(s.body, times * int(n) if fixed else None)
+            elif isinstance(s, A.WhileStmt):
+                scan(s.body, None)
+            elif not isinstance(s, A.ExprStmt):
+                raise _Sequential()
+
+    try:
+        scan(body, 1)
+    except _Sequential:
+        return None
+    plan = RepeatPlan(body)
+    for n in A.walk(A.Program(body)):
+        if isinstance(n, A.Call):
+            if not isinstance(n.callee, A.Var) or n.callee.name in writes:
+                return None
+            plan.calls.add(n.callee.name)
+        elif isinstance(n, A.Var):
+            if n.slot >= 0:
+                return None
+            if n.name not in writes:
+                plan.reads.add(n.name)
+    for name, ws in writes.items():
+        if _private(name, body):
+            plan.privates.append(name)
+            continue
+        counter = _counter(name, ws, writes)
+        if counter is not None:
+            plan.counters[name] = counter
+            continue
+        kind = _reduction(name, body)
+        if kind is None:
+            return None
+        plan.reductions[name] = kind
+    plan.cost = max(_cost(body), 1)
+    return plan
+
+def _run_chunk(blob):
+    # Runs in a worker process: one chunk of turns in a fresh interpreter.
+    job = pickle.loads(blob)
+    interp = Interpreter(max_heap=job["max_heap"], memo=job["memo"])
+    env = interp.env
+    for name, params, body, slots in job["funs"]:
+        env.define(name, Function(A.FunStmt(name, params, body, slots), env))
+    for name, v in job["values"].items():
+        env.define(name, v)
+    try:
+        for _ in range(job["count"]):
+            interp.exec_block(job["body"])
+    except RuntimeErrorKid as e:
+        return ("error", str(e))
+    except Exception:
+        return ("fallback",)  # the plain run will say what went wrong
+    out = {}
+    for name in job["results"]:
+        v = env.values.get(name)
+        if not isinstance(v, PLAIN):
+            return ("fallback",)
+        out[name] = v
+    for name in job["numeric"]:
+        if type(out[name]) not in (int, float):
+            return ("fallback",)
+    for name in job["whole"]:
+        if type(out[name]) is not int:
+            return ("fallback",)
+    return ("ok", out)
+
+class ParallelInterpreter(Interpreter):
+    def __init__(self, *args, jobs=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.jobs = jobs or os.cpu_count() or 1
+        self._plans = {}  # id(RepeatStmt) -> (stmt, plan or None)
+        self._pool = None
+
+    def run(self, program):
+        # Only the program's own top-level loops are looked at, so statements
+        # everywhere else run without an extra check. Step mode and the other
+        # tools that trap statements use the plain run instead.
+        resolve(program, self.env.values)
+        try:
+            for stmt in program.statements:
+                if stmt.__class__ is A.RepeatStmt and self.jobs > 1:
+                    self._repeat(stmt)
+                else:
+                    self.exec_stmt(stmt)
+        except RuntimeErrorKid as e:
+            raise RuntimeErrorKid(str(e))
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def _repeat(self, stmt):
+        entry = self._plans.get(id(stmt))
+        if entry is None:
+            entry = self._plans[id(stmt)] = (stmt, plan_repeat(stmt))
+        plan = entry[1]
+        if plan is None:
+            self.exec_stmt(stmt)
+            return
+        n = _repeat_count(self.eval_expr(stmt.count))
+        if n * plan.cost < PARALLEL_MIN_WORK or not self._run_parallel(plan, n):
+            for _ in range(n):
+                self.exec_block(stmt.body)
+
+    def _functions(self, plan):
+        # The pure funs the body calls, and the ones those call, by name.
+        funs = {}
+
+        def add(fn):
+            if funs.setdefault(fn.name, fn) is not fn:
+                raise _Sequential()
+            for n in A.walk(A.Program(fn.body)):
+                if isinstance(n, A.Var) and n.slot < 0:
+                    other = fn.env.values.get(n.name)
+                    if isinstance(other, Function) and other.name not in funs:
+                        add(other)
+
+        for name in plan.calls:
+            v = self.env.values.get(name)
+            if isinstance(v, NativeFunction) and v.pure and STDLIB.natives.get(name) is v:
+                continue
+            if not isinstance(v, Function):
+                raise _Sequential()
+            if v.pure is None:
+                v.pure = self._is_pure(v, set())
+            if not v.pure:
+                raise _Sequential()
+            add(v)
+        return funs
+
+    def _job_values(self, plan, funs):
+        values = self.env.values
+        try:
+            changed = {*plan.privates, *plan.counters, *plan.reductions}
+            if any(name in changed for name in funs):
+                raise _Sequential()  # the body would change what a fun sees
+            data = {}
+            for name in plan.reads:
+                if name in funs or name in plan.calls:
+                    continue
+                v = values.get(name, KeyError)
+                if not isinstance(v, PLAIN):
+                    raise _Sequential()
+                data[name] = v
+            for name in plan.privates:
+                if name in values:
+                    data[name] = None  # set before it is read; only needs to exist
+            starts = {}
+            for name, (times, step) in plan.counters.items():
+                v0 = values.get(name)
+                step = step.value if isinstance(step, A.Number) else values.get(step.name)
+                if type(v0) is not int or type(step) is not int:
+                    raise _Sequential()
+                starts[name] = (v0, times * step)
+            for name, kind in plan.reductions.items():
+                if type(values.get(name)) not in ((int,) if kind in IDENTITY else (int, float)):
+                    raise _Sequential()
+        except _Sequential:
+            return None
+        return data, starts
+
+    def _run_parallel(self, plan, n):
+        try:
+            funs = self._functions(plan)
+        except _Sequential:
+            return False
+        prepared = self._job_values(plan, funs)
+        if prepared is None:
+            return False
+        data, starts = prepared
+        values = self.env.values
+        chunks = min(n, self.jobs * CHUNKS_PER_JOB)
+        size, extra = divmod(n, chunks)
+        blobs, start = [], 0
+        for k in range(chunks):
+            count = size + (k < extra)
+            init = dict(data)
+            for name, (v0, step) in starts.items():
+                init[name] = _fast_add(v0, step * start)
+            for name, kind in plan.reductions.items():
+                init[name] = values[name] if k == 0 or kind not in IDENTITY else IDENTITY[kind]
+            job = {
+                "body": plan.body, "count": count, "values": init,
+                "funs": [(f.name, f.params, f.body, f.slots) for f in funs.values()],
+                "results": [*plan.privates, *plan.reductions],
+                "numeric": list(plan.reductions),
+                "whole": [name for name, kind in plan.reductions.items() if kind in IDENTITY],
+                "max_heap": self.max_heap, "memo": self.memo,
+            }
+            try:
+                blobs.append(pickle.dumps(job))
+            except (pickle.PicklingError, TypeError, AttributeError):
+                return False
+            start += count
+        try:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.jobs)
+            results = list(self._pool.map(_run_chunk, blobs))
+        except (BrokenProcessPool, OSError):
+            self._pool = None
+            return False
+        if any(r[0] == "fallback" for r in results):
+            return False
+        for r in results:
+            if r[0] == "error":
+                raise RuntimeErrorKid(r[1])
+
+        outs = [r[1] for r in results]
+        for name in plan.privates:
+            self._store(name, outs[-1][name])
+        for name, (v0, step) in starts.items():
+            self._store(name, _fast_add(v0, step * n))
+        for name, kind in plan.reductions.items():
+            acc = outs[0][name]
+            for out in outs[1:]:
+                acc = self._combine(kind, acc, out[name])
+            self._store(name, acc)
+        return True
+
+    def _combine(self, kind, acc, part):
+        if kind == "sum":
+            return _fast_add(acc, part)
+        if kind == "product":
+            return _fast_mul(acc, part)
+        _, op, value_on_left = kind
+        hit = COMPARE[op](part, acc) if value_on_left else COMPARE[op](acc, part)
+        return part if hit else acc
+
+    def _store(self, name, val):
+        # what a top-level `let` does
+        if isinstance(val, SIZED) or name in self.env.sizes:
+            self._account(self.env.sizes, name, val)
+        self.env.define(name, val)
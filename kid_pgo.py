@@ -0,0 +1,168 @@
+import os, json, pathlib, tempfile, threading
+from dataclasses import dataclass
+from typing import Any
+
+import ast_nodes as A
+from kid_cache import token_key
+from resolver import resolve
+from interpreter import Interpreter, FAST_OPS, FAST_TYPES, _truthy, _repeat_count
+
+# Profile-guided runs: `kidlang.py --pgo record|use|off`.
+#
+#   record  runs the program while counting how often each loop goes round,
+#           which way each `if` goes, and whether each arithmetic or
+#           comparison operator only ever saw plain numbers. The counts are
+#           added to the program's saved profile.
+#   use     loads the profile and, before the first statement runs, gives
+#           hot number-only operators a direct path (Binary.fast) and hot
+#           ifs the answer to test first (IfStmt.likely).
+#
+# Hints are only shortcuts: each checks what it gets and falls back to the
+# normal path, so an out-of-date profile can cost a little speed, never a
+# wrong answer. Profiles are keyed by kid_cache.token_key, so spacing and
+# comments do not matter, and are kept in __kidcache__ next to the program,
+# like Python's __pycache__. Nodes are numbered in walk() order after
+# resolve(), which is the same for every run of the same tokens; imported
+# modules are not profiled.
+
+PROFILE_VERSION = 1
+PROFILE_DIR = "__kidcache__"
+HOT = 64  # times a node must have run before it gets a hint
+
+_lock = threading.Lock()
+
+def new_profile(nodes=0):
+    return {"version": PROFILE_VERSION, "nodes": nodes, "runs": 0,
+            "loops": {}, "branches": {}, "binary": {}}
+
+def profile_path(src, program_path):
+    return pathlib.Path(program_path).parent / PROFILE_DIR / f"{token_key(src)}.json"
+
+def load_profile(path):
+    try:
+        data = json.loads(pathlib.Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != PROFILE_VERSION:
+        return None
+    try:
+        for part in ("loops", "branches", "binary"):
+            data[part] = {int(k): v for k, v in data[part].items()}
+    except (KeyError, ValueError, AttributeError):
+        return None
+    return data
+
+def save_profile(path, profile):
+    # Written to a temporary file and renamed, so a reader never sees half.
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(profile, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def merge_profiles(old, new):
+    if old is None or old["nodes"] != new["nodes"]:
+        return new
+    out = new_profile(new["nodes"])
+    out["runs"] = old["runs"] + new["runs"]
+    for k in set(old["loops"]) | set(new["loops"]):
+        out["loops"][k] = old["loops"].get(k, 0) + new["loops"].get(k, 0)
+    for part in ("branches", "binary"):
+        for k in set(old[part]) | set(new[part]):
+            a, b = old[part].get(k, (0, 0)), new[part].get(k, (0, 0))
+            out[part][k] = [a[0] + b[0], a[1] + b[1]]
+    return out
+
+def number_nodes(program):
+    return {id(n): i for i, n in enumerate(A.walk(program))}
+
+def apply_profile(program, profile, env_values):
+    # Returns how many nodes got a hint; 0 if the profile is for other code.
+    resolve(program, env_values)
+    nodes = list(A.walk(program))
+    if profile is None or profile["nodes"] != len(nodes):
+        return 0
+    hinted = 0
+    with _lock:
+        for i, node in enumerate(nodes):
+            if isinstance(node, A.Binary) and node.op in FAST_OPS:
+                numbers, other = profile["binary"].get(i, (0, 0))
+                node.fast = FAST_OPS[node.op] if numbers >= HOT and not other else None
+                hinted += node.fast is not None
+            elif isinstance(node, A.IfStmt):
+                then, other = profile["branches"].get(i, (0, 0))
+                node.likely = (then >= other) if then + other >= HOT else None
+                hinted += node.likely is not None
+    return hinted
+
+def hot_loops(profile, program, top=3):
+    nodes = list(A.walk(program))
+    loops = sorted(profile["loops"].items(), key=lambda kv: -kv[1])[:top]
+    return [(nodes[i].line, turns) for i, turns in loops if i < len(nodes)]
+
+# Stand-ins the recorder evaluates in place of a node's own children, so the
+# normal code runs on values that have already been looked at.
+@dataclass
+class _Value(A.Node):
+    value: Any
+
+@dataclass
+class _Probe(A.Node):
+    inner: Any
+    key: int
+
+class PGORecorder(Interpreter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profile = new_profile()
+        self._index = {}
+
+    def run(self, program):
+        resolve(program, self.env.values)
+        self._index = number_nodes(program)
+        self.profile["nodes"] = len(self._index)
+        self.profile["runs"] = 1
+        super().run(program)
+
+    def eval_expr(self, expr):
+        cls = expr.__class__
+        if cls is _Value:
+            return expr.value
+        if cls is _Probe:
+            v = self.eval_expr(expr.inner)
+            if _truthy(v):
+                loops = self.profile["loops"]
+                loops[expr.key] = loops.get(expr.key, 0) + 1
+            return v
+        if cls is A.Binary and expr.op in FAST_OPS:
+            i = self._index.get(id(expr))
+            if i is not None:
+                left = self.eval_expr(expr.left)
+                right = self.eval_expr(expr.right)
+                seen = self.profile["binary"].setdefault(i, [0, 0])
+                seen[0 if type(left) in FAST_TYPES and type(right) in FAST_TYPES else 1] += 1
+                return super().eval_expr(A.Binary(_Value(left), expr.op, _Value(right)))
+        return super().eval_expr(expr)
+
+    def exec_stmt(self, stmt):
+        cls = stmt.__class__
+        if cls is A.IfStmt or cls is A.WhileStmt or cls is A.RepeatStmt:
+            i = self._index.get(id(stmt))
+            if i is not None:
+                return self._exec_watched(stmt, i)
+        return super().exec_stmt(stmt)
+
+    def _exec_watched(self, stmt, i):
+        if isinstance(stmt, A.IfStmt):
+            cond = self.eval_expr(stmt.cond)
+            seen = self.profile["branches"].setdefault(i, [0, 0])
+            seen[0 if _truthy(cond) else 1] += 1
+            return super().exec_stmt(A.IfStmt(_Value(cond), stmt.then_body, stmt.else_body))
+        if isinstance(stmt, A.WhileStmt):
+            return super().exec_stmt(A.WhileStmt(_Probe(stmt.cond, i), stmt.body))
+        n = self.eval_expr(stmt.count)
+        result = super().exec_stmt(A.RepeatStmt(_Value(n), stmt.body))
+        loops = self.profile["loops"]
+        loops[i] = loops.get(i, 0) + _repeat_count(n)
+        return result
@@ -0,0 +1,97 @@
+import time, multiprocessing as mp
+
+try:
+    import resource
+except ImportError:  # Windows has no rlimits
+    resource = None
+
+from interpreter import DEFAULT_MAX_HEAP
+from kid_runner import run_source, EXIT_KID_ERROR, EXIT_CRASH, EXIT_TIMEOUT
+
+# A Worker is one long-lived child process that runs KidLang programs sent
+# over a pipe. If a program hangs or kills the process, only that worker is
+# thrown away and a fresh one takes its place.
+
+def _limit_memory(mem_mb):
+    if resource is None or not mem_mb:
+        return
+    limit = int(mem_mb) * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass
+
+def _worker_main(conn, mem_mb, max_heap, import_path):
+    _limit_memory(mem_mb)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        try:
+            result = run_source(job["source"], job.get("stdin", ""), max_heap, import_path)
+        except MemoryError:
+            result = {"stdout": "", "error": "Your program used too much memory.",
+                      "exit": EXIT_KID_ERROR, "timings": {}}
+        conn.send(result)
+
+class Worker:
+    def __init__(self, mem_mb=None, max_heap=DEFAULT_MAX_HEAP, import_path=()):
+        self.mem_mb = mem_mb
+        self.max_heap = max_heap
+        self.import_path = list(import_path)
+        self.proc = None
+        self.conn = None
+        self.start()
+
+    def start(self):
+        parent, child = mp.Pipe()
+        self.proc = mp.Process(target=_worker_main, args=(child, self.mem_mb, self.max_heap, self.import_path), daemon=True)
+        self.proc.start()
+        child.close()
+        self.conn = parent
+
+    def restart(self):
+        self.kill()
+        self.start()
+
+    def kill(self):
+        if self.proc is not None and self.proc.is_alive():
+            self.proc.kill()
+        if self.proc is not None:
+            self.proc.join()
+        if self.conn is not None:
+            self.conn.close()
+        self.proc = None
+        self.conn = None
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+        if self.proc is not None:
+            self.proc.join(timeout=1)
+        self.kill()
+
+    def run(self, job, timeout=None):
+        t0 = time.perf_counter()
+        try:
+            self.conn.send(job)
+            if self.conn.poll(timeout):
+                result = self.conn.recv()
+            else:
+                self.restart()
+                result = {"stdout": "", "error": f"Time limit of {timeout}s exceeded.",
+                          "exit": EXIT_TIMEOUT, "timings": {}}
+        except (EOFError, OSError):
+            self.proc.join(timeout=1)
+            code = self.proc.exitcode
+            self.restart()
+            result = {"stdout": "", "error": f"Worker crashed (exit code {code}).",
+                      "exit": EXIT_CRASH, "timings": {}}
+        result["timings"]["wall"] = time.perf_counter() - t0
+        return result
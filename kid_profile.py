@@ -0,0 +1,98 @@
+import time
+
+from interpreter import Interpreter
+
+# Profiling interpreter used by `kidlang.py --profile`.
+#
+# Every statement is timed. "total" includes the statements nested inside it
+# (a loop's total covers its body), "self" does not. Self time is also summed
+# per statement stack so it can be written out as collapsed stacks
+# ("while@3;if@4;ExprStmt@5 1234", values in microseconds) for flamegraph.pl,
+# speedscope and friends.
+
+class StmtStats:
+    __slots__ = ("label", "line", "count", "total", "self_time", "active")
+
+    def __init__(self, label, line):
+        self.label = label
+        self.line = line
+        self.count = 0
+        self.total = 0.0
+        self.self_time = 0.0
+        self.active = 0
+
+_LABELS = {
+    "LetStmt": "let",
+    "AssignStmt": "set",
+    "ExprStmt": "expr",
+    "IfStmt": "if",
+    "WhileStmt": "while",
+    "RepeatStmt": "repeat",
+    "FunStmt": "fun",
+    "ReturnStmt": "return",
+    "ImportStmt": "import",
+}
+
+class ProfilingInterpreter(Interpreter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stmt_stats = {}
+        self.stacks = {}
+        self._frames = []  # [stats, path, child_time]
+
+    def exec_stmt(self, stmt):
+        st = self.stmt_stats.get(id(stmt))
+        if st is None:
+            name = type(stmt).__name__
+            st = StmtStats(f"{_LABELS.get(name, name)}@{stmt.line}", stmt.line)
+            self.stmt_stats[id(stmt)] = st
+
+        frames = self._frames
+        path = frames[-1][1] + ";" + st.label if frames else st.label
+        frame = [st, path, 0.0]
+        frames.append(frame)
+        st.active += 1
+        t0 = time.perf_counter()
+        try:
+            return super().exec_stmt(stmt)
+        finally:
+            dt = time.perf_counter() - t0
+            frames.pop()
+            st.active -= 1
+            st.count += 1
+            if st.active == 0:
+                st.total += dt  # recursion must not count the same time twice
+            own = dt - frame[2]
+            st.self_time += own
+            self.stacks[path] = self.stacks.get(path, 0.0) + own
+            if frames:
+                frames[-1][2] += dt
+
+    def line_stats(self):
+        lines = {}
+        for st in self.stmt_stats.values():
+            row = lines.setdefault(st.line, [0, 0.0, 0.0])
+            row[0] += st.count
+            row[1] = max(row[1], st.total)  # nested statements on one line overlap
+            row[2] += st.self_time
+        return lines
+
+    def report(self, src_lines=None, limit=30):
+        rows = sorted(self.line_stats().items(), key=lambda kv: kv[1][2], reverse=True)
+        grand = sum(r[2] for _, r in rows) or 1.0
+        out = [f"{'line':>6} {'count':>10} {'total ms':>10} {'self ms':>10} {'self%':>6}  source"]
+        for line, (count, total, own) in rows[:limit]:
+            text = ""
+            if src_lines is not None and 0 < line <= len(src_lines):
+                text = src_lines[line - 1].strip()
+            out.append(
+                f"{line:>6} {count:>10} {total * 1000:>10.3f} {own * 1000:>10.3f} "
+                f"{own / grand * 100:>5.1f}%  {text}"
+            )
+        return "\n".join(out)
+
+    def collapsed(self):
+        return "\n".join(
+            f"{path} {max(int(t * 1e6), 1)}"
+            for path, t in sorted(self.stacks.items())
+        ) + "\n"
@@ -0,0 +1,171 @@
+import io, sys, json, argparse, pathlib
+
+import ast_nodes as A
+from kid_lexer import lex
+from parser import Parser, ParseError
+from interpreter import Interpreter, RuntimeErrorKid, DEFAULT_MAX_HEAP
+from kid_natives import NativeFunction
+
+# Interactive mode. One Interpreter stays alive, so variables, functions and
+# imports from earlier inputs are still there for later ones.
+#
+#   python kidlang.py repl      prompt for code, run each statement as it is complete
+#   python kidlang.py kernel    the same session over JSON lines on stdin/stdout
+#
+# Kernel requests and replies (one JSON object per line, "id" is echoed back):
+#   {"id": 1, "cmd": "run", "code": "let x = 2\nx * 3", "stdin": ["Ada"]}
+#       -> {"id": 1, "stdout": "", "value": "6", "error": null}
+#   {"id": 2, "cmd": "complete", "code": "if x then"}  -> {"id": 2, "complete": false}
+#   {"id": 3, "cmd": "vars"}      -> {"id": 3, "vars": {"x": "2"}}
+#   {"id": 4, "cmd": "reset"}     -> {"id": 4, "ok": true}
+#   {"id": 5, "cmd": "shutdown"}  -> {"id": 5, "ok": true}
+# ask() in a kernel cell reads from the cell's "stdin" lines, never from the
+# kernel's own stdin (that is the protocol channel).
+
+OPENERS = {"if", "while", "repeat", "fun"}
+
+def open_blocks(src):
+    # if/while/repeat/fun each need an `end`; a cell is complete at depth 0.
+    depth = 0
+    for t in lex(src):
+        if t.kind == "KW":
+            if t.lexeme in OPENERS:
+                depth += 1
+            elif t.lexeme == "end":
+                depth -= 1
+    return depth
+
+def is_complete(src):
+    try:
+        return open_blocks(src) <= 0
+    except SyntaxError:
+        return True  # let running it report the error
+
+def _show(interp, v):
+    if isinstance(v, str):
+        return json.dumps(v, ensure_ascii=False)
+    return interp._stringify(v)
+
+class Session:
+    def __init__(self, **opts):
+        self.opts = opts
+        self.reset()
+
+    def reset(self):
+        self.interp = Interpreter(**self.opts)
+
+    def run_cell(self, src):
+        # Returns (value of a trailing expression or None, error text or None).
+        interp = self.interp
+        try:
+            program = Parser(lex(src)).parse()
+            value = None
+            for stmt in program.statements:
+                result = interp.exec_stmt(stmt)
+                value = result if isinstance(stmt, A.ExprStmt) else None
+        except (SyntaxError, ParseError, RuntimeErrorKid) as e:
+            return None, str(e)
+        except RecursionError:
+            return None, "Your program went too deep (too many nested steps)."
+        except MemoryError:
+            return None, "Your program used too much memory."
+        return (None if value is None else _show(interp, value)), None
+
+    def variables(self):
+        return {
+            k: _show(self.interp, v)
+            for k, v in self.interp.env.values.items()
+            if not isinstance(v, NativeFunction)
+        }
+
+def repl(session, stdin=None, stdout=None):
+    streams = stdin, stdout  # for say/ask; None keeps the process's own
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    print("KidLang. Type code; :vars shows variables, :reset starts over, :quit leaves.", file=stdout)
+    buf = []
+    while True:
+        stdout.write("...  " if buf else "kid> ")
+        stdout.flush()
+        line = stdin.readline()
+        if not line:
+            print(file=stdout)
+            return 0
+        line = line.rstrip("\n")
+        if not buf and line.strip() in (":quit", ":q"):
+            return 0
+        if not buf and line.strip() == ":vars":
+            for k, v in session.variables().items():
+                print(f"{k} = {v}", file=stdout)
+            continue
+        if not buf and line.strip() == ":reset":
+            session.reset()
+            continue
+        buf.append(line)
+        src = "\n".join(buf) + "\n"
+        if not is_complete(src):
+            continue
+        buf = []
+        session.interp.stdin, session.interp.stdout = streams
+        value, error = session.run_cell(src)
+        if error is not None:
+            print(f"ERROR:\n{error}", file=stdout)
+        elif value is not None:
+            print(f"=> {value}", file=stdout)
+
+def kernel(session, stdin=None, stdout=None):
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+
+    def reply(req, **body):
+        stdout.write(json.dumps({"id": req.get("id"), **body}) + "\n")
+        stdout.flush()
+
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            req = json.loads(line)
+        except json.JSONDecodeError as e:
+            reply({}, error=f"bad request: {e}")
+            continue
+        cmd = req.get("cmd")
+        if cmd == "run":
+            lines = req.get("stdin", [])
+            if isinstance(lines, list):
+                lines = "".join(str(s) + "\n" for s in lines)
+            out = io.StringIO()
+            interp = session.interp
+            interp.stdin, interp.stdout = io.StringIO(lines), out
+            try:
+                value, error = session.run_cell(req.get("code", ""))
+            finally:
+                interp.stdin = interp.stdout = None
+            reply(req, stdout=out.getvalue(), value=value, error=error)
+        elif cmd == "complete":
+            reply(req, complete=is_complete(req.get("code", "")))
+        elif cmd == "vars":
+            reply(req, vars=session.variables())
+        elif cmd == "reset":
+            session.reset()
+            reply(req, ok=True)
+        elif cmd == "shutdown":
+            reply(req, ok=True)
+            return 0
+        else:
+            reply(req, error=f"unknown command {cmd!r}")
+    return 0
+
+def main(argv=None, mode="repl"):
+    ap = argparse.ArgumentParser(prog=f"kidlang.py {mode}")
+    ap.add_argument("--lib", action="append", default=[], metavar="DIR",
+                    help="also look for imported modules here (repeatable)")
+    ap.add_argument("--memo", action="store_true", help="remember results of pure functions")
+    ap.add_argument("--max-heap", metavar="MB", type=float, default=DEFAULT_MAX_HEAP / (1024 * 1024))
+    args = ap.parse_args(argv)
+    session = Session(
+        memo=args.memo,
+        max_heap=int(args.max_heap * 1024 * 1024),
+        import_path=[pathlib.Path.cwd(), *args.lib],
+    )
+    return kernel(session) if mode == "kernel" else repl(session)
@@ -0,0 +1,52 @@
+import io, time
+
+from kid_lexer import lex
+from parser import Parser, ParseError
+from interpreter import Interpreter, RuntimeErrorKid, DEFAULT_MAX_HEAP
+from resolver import resolve
+
+# Runs one KidLang program in-process and captures everything it printed.
+# Used by batch mode and the worker pool; the CLI keeps printing directly.
+
+EXIT_OK = 0
+EXIT_KID_ERROR = 1
+EXIT_CRASH = 70
+EXIT_TIMEOUT = 124
+
+def run_source(src: str, stdin_text: str = "", max_heap=DEFAULT_MAX_HEAP, import_path=()):
+    # Touches no process-wide streams, so it is safe to call from many threads.
+    out = io.StringIO()
+    interp = Interpreter(max_heap=max_heap, import_path=import_path,
+                         stdin=io.StringIO(stdin_text), stdout=out)
+    timings = {}
+    error = None
+    status = EXIT_OK
+
+    t0 = time.perf_counter()
+    try:
+        tokens = lex(src)
+        t1 = time.perf_counter()
+        timings["lex"] = t1 - t0
+        program = Parser(tokens).parse()
+        resolve(program, interp.env.values)  # its errors quote line:col too, see kid_cache.cacheable
+        t2 = time.perf_counter()
+        timings["parse"] = t2 - t1
+        interp.run(program)
+        timings["run"] = time.perf_counter() - t2
+    except (SyntaxError, ParseError, RuntimeErrorKid) as e:
+        error = str(e)
+        status = EXIT_KID_ERROR
+    except RecursionError:
+        error = "Your program went too deep (too many nested steps)."
+        status = EXIT_KID_ERROR
+    except MemoryError:
+        error = "Your program used too much memory."
+        status = EXIT_KID_ERROR
+
+    return {
+        "stdout": out.getvalue(),
+        "error": error,
+        "exit": status,
+        "timings": timings,
+        "peak_heap": interp.heap_peak,
+    }
@@ -0,0 +1,276 @@
+from collections import deque
+
+import ast_nodes as A
+from interpreter import (
+    Interpreter, RuntimeErrorKid, LOOP_LIMIT, INFINITE_LOOP_MSG, UNSET,
+    _truthy, _repeat_count,
+)
+from resolver import resolve
+
+# Green-thread mode: many KidLang programs share one Python process.
+#
+#   sched = Scheduler(fuel=500)
+#   task = sched.spawn(Parser(lex(src)).parse())
+#   sched.feed(task, "Ada")
+#   sched.run()
+#   print(task.take_output())
+#
+# Each Task keeps its own explicit stack of blocks and loops instead of using
+# Python recursion, so it can stop after any statement and pick up later. A
+# slice runs at most `fuel` statements (loop conditions count too), then the
+# next ready task gets a turn. A call to a fun runs to its end inside the
+# statement that made it, but every statement it runs is counted: against
+# max_fuel as it goes, and against the slice, so the task gets a shorter turn.
+# That makes max_fuel what stops one long call from holding the process, so it
+# defaults to DEFAULT_MAX_FUEL statements per task; max_fuel=None lifts the
+# limit and is only for programs you trust.
+#
+# ask() with no input waiting parks the task. The statement that called it is
+# run again from the start once a line arrives: the answers it already got are
+# replayed, anything it printed in the meantime is thrown away, and globals a
+# fun changed in it are put back, so a statement's effects only happen once.
+
+READY = "ready"
+WAITING = "waiting"
+DONE = "done"
+FAILED = "error"
+
+DEFAULT_MAX_FUEL = 10_000_000
+
+TOO_MANY_STEPS_MSG = (
+    "Your program ran for too many steps.\n"
+    "Fix: check that every loop can finish."
+)
+
+_SETS_GLOBAL = (A.LetStmt, A.AssignStmt)
+
+class _NeedInput(Exception):
+    pass
+
+class _TaskInterpreter(Interpreter):
+    # say/ask talk to the task's buffers instead of stdout/stdin.
+    def __init__(self, task):
+        super().__init__()
+        self.task = task
+
+    def exec_stmt(self, stmt):
+        # Statements inside a call: count them, and note the old value of
+        # any global they change in case the statement has to be replayed.
+        if self.call_depth:
+            task = self.task
+            task._spend()
+            if stmt.__class__ in _SETS_GLOBAL:
+                if stmt.slot < 0:
+                    task._remember(self.env, stmt.name)
+            elif isinstance(stmt, A.FunStmt):
+                task._remember(self.env, stmt.name)
+            elif isinstance(stmt, A.ImportStmt):
+                task._remember(self.env, None)
+        return super().exec_stmt(stmt)
+
+    def write(self, text):
+        self.task._pending.append(text)
+
+    def read_line(self, prompt):
+        task = self.task
+        task._pending.append(prompt)
+        if task._ask_i < len(task._answers):
+            line = task._answers[task._ask_i]
+        elif task.inbox:
+            line = task.inbox.popleft()
+            task._answers.append(line)
+        else:
+            raise _NeedInput()
+        task._ask_i += 1
+        return line
+
+class Task:
+    def __init__(self, program: A.Program, name=None, max_fuel=DEFAULT_MAX_FUEL):
+        self.name = name
+        self.max_fuel = max_fuel
+        self.used = 0
+        self.state = READY
+        self.error = None
+        self.prompt = ""  # what the parked statement printed so far
+
+        self.inbox = deque()
+        self._answers = []
+        self._ask_i = 0
+        self._pending = []
+        self._output = []
+        self._spent = 0  # statements run inside calls by the current one
+        self._undo = {}  # (id(env), name) -> (env, name, value before); name None: all of env
+
+        self.interp = _TaskInterpreter(self)
+        resolve(program, self.interp.env.values)  # may raise ParseError, like parsing
+        self.stack = [["block", program.statements, 0]]
+
+    def take_output(self):
+        out = "".join(self._output)
+        self._output.clear()
+        return out
+
+    def run_slice(self, fuel):
+        try:
+            while fuel > 0 and self.stack:
+                if self.max_fuel is not None and self.used >= self.max_fuel:
+                    raise RuntimeErrorKid(TOO_MANY_STEPS_MSG)
+                self._ask_i = 0
+                self._pending.clear()
+                self._spent = 0
+                self._undo.clear()
+                try:
+                    self._advance()
+                except _NeedInput:
+                    self._rollback()
+                    self.used += self._spent
+                    self.prompt = "".join(self._pending)
+                    self.state = WAITING
+                    return
+                self._output.extend(self._pending)
+                self._answers.clear()
+                self.used += 1 + self._spent
+                fuel -= 1 + self._spent
+        except RuntimeErrorKid as e:
+            self._fail(str(e))
+            return
+        except RecursionError:
+            self._fail("Your program went too deep (too many nested steps).")
+            return
+        self.state = READY if self.stack else DONE
+
+    def _spend(self):
+        self._spent += 1
+        if self.max_fuel is not None and self.used + self._spent >= self.max_fuel:
+            raise RuntimeErrorKid(TOO_MANY_STEPS_MSG)
+
+    def _remember(self, env, name):
+        key = (id(env), name)
+        if key not in self._undo:
+            before = dict(env.values) if name is None else env.values.get(name, UNSET)
+            self._undo[key] = (env, name, before)
+
+    def _rollback(self):
+        # Puts back the globals changed since the statement started, newest
+        # first, keeping the heap count in step.
+        interp = self.interp
+        for env, name, before in reversed(list(self._undo.values())):
+            if name is None:
+                env.values.clear()
+                env.values.update(before)
+                continue
+            interp._account(env.sizes, name, None if before is UNSET else before)
+            if before is UNSET:
+                env.values.pop(name, None)
+            else:
+                env.values[name] = before
+        self._undo.clear()
+
+    def _fail(self, msg):
+        self._output.extend(self._pending)
+        self.error = msg
+        self.state = FAILED
+        self.stack.clear()
+
+    def _advance(self):
+        # One unit of work: a simple statement, or one decision of an if/loop.
+        # A call to a fun runs to completion inside its statement, so an ask()
+        # in a function replays the whole statement once the answer arrives.
+        # The frame is only moved forward after the work succeeded, so a
+        # parked ask() leaves the stack (and, after _rollback, the globals)
+        # exactly as they were.
+        frame = self.stack[-1]
+        kind = frame[0]
+        interp = self.interp
+
+        if kind == "block":
+            stmts, i = frame[1], frame[2]
+            if i >= len(stmts):
+                self.stack.pop()
+                return
+            stmt = stmts[i]
+
+            if isinstance(stmt, A.IfStmt):
+                cond = _truthy(interp.eval_expr(stmt.cond))
+                frame[2] = i + 1
+                if cond:
+                    self.stack.append(["block", stmt.then_body, 0])
+                elif stmt.else_body is not None:
+                    self.stack.append(["block", stmt.else_body, 0])
+                return
+
+            if isinstance(stmt, A.WhileStmt):
+                frame[2] = i + 1
+                self.stack.append(["while", stmt, 0])
+                return
+
+            if isinstance(stmt, A.RepeatStmt):
+                n = _repeat_count(interp.eval_expr(stmt.count))
+                frame[2] = i + 1
+                self.stack.append(["repeat", stmt, n])
+                return
+
+            interp.exec_stmt(stmt)
+            frame[2] = i + 1
+            return
+
+        if kind == "while":
+            stmt = frame[1]
+            if not _truthy(interp.eval_expr(stmt.cond)):
+                self.stack.pop()
+                return
+            frame[2] += 1
+            if frame[2] > LOOP_LIMIT:
+                raise RuntimeErrorKid(INFINITE_LOOP_MSG)
+            self.stack.append(["block", stmt.body, 0])
+            return
+
+        if kind == "repeat":
+            if frame[2] <= 0:
+                self.stack.pop()
+                return
+            frame[2] -= 1
+            self.stack.append(["block", frame[1].body, 0])
+            return
+
+        raise RuntimeErrorKid(f"Unknown frame: {kind}")
+
+class Scheduler:
+    def __init__(self, fuel=1000):
+        self.fuel = fuel
+        self.ready = deque()
+        self.tasks = []
+
+    def spawn(self, program, name=None, max_fuel=DEFAULT_MAX_FUEL):
+        task = Task(program, name=name, max_fuel=max_fuel)
+        self.tasks.append(task)
+        self.ready.append(task)
+        return task
+
+    def feed(self, task, line):
+        task.inbox.append(line)
+        if task.state == WAITING:
+            task.state = READY
+            self.ready.append(task)
+
+    def tick(self):
+        # Give every task that is ready right now one slice.
+        for _ in range(len(self.ready)):
+            task = self.ready.popleft()
+            task.run_slice(self.fuel)
+            if task.state == READY:
+                self.ready.append(task)
+        return bool(self.ready)
+
+    def run(self):
+        # Runs until every task is finished or waiting for input.
+        while self.tick():
+            pass
+
+    def waiting(self):
+        return [t for t in self.tasks if t.state == WAITING]
+
+    def reap(self):
+        done = [t for t in self.tasks if t.state in (DONE, FAILED)]
+        self.tasks = [t for t in self.tasks if t.state not in (DONE, FAILED)]
+        return done
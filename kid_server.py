@@ -0,0 +1,236 @@
+import os, json, time, argparse, threading, queue
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from kid_pool import Worker
+from interpreter import DEFAULT_MAX_HEAP
+from kid_cache import ResultCache, run_key
+
+# Local execution service:
+#   python kidlang.py serve --port 8765 --workers 4
+#
+#   POST /run      {"source": "...", "stdin": ["line 1", "line 2"]}
+#              ->  {"stdout": "...", "error": null, "exit": 0, "timings": {...}}
+#   GET  /metrics  Prometheus text format
+#   GET  /health
+#
+# Programs run in a pool of warm worker processes (see kid_pool.py). Requests
+# wait in a bounded queue; when it is full the server answers 429 right away
+# instead of piling up work it cannot finish in time.
+
+MAX_BODY = 1024 * 1024
+MB = 1024 * 1024
+
+class _Request:
+    __slots__ = ("job", "done", "result", "cancelled", "queued_at")
+
+    def __init__(self, job):
+        self.job = job
+        self.done = threading.Event()
+        self.result = None
+        self.cancelled = False
+        self.queued_at = time.perf_counter()
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.rejected = 0
+        self.in_flight = 0
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.queue_wait_sum = 0.0
+
+    def record(self, exit_code, latency, queue_wait):
+        with self.lock:
+            self.requests[exit_code] = self.requests.get(exit_code, 0) + 1
+            self.latency_sum += latency
+            self.latency_count += 1
+            self.queue_wait_sum += queue_wait
+
+class ExecService:
+    def __init__(self, workers=None, queue_size=64, timeout=5.0, mem_mb=None, cache_size=4096,
+                 max_heap=DEFAULT_MAX_HEAP, import_path=()):
+        self.timeout = timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = Stats()
+        self.cache = ResultCache(cache_size) if cache_size > 0 else None
+        self.workers = [Worker(mem_mb, max_heap, import_path) for _ in range(workers or os.cpu_count() or 1)]
+        self.threads = []
+        for w in self.workers:
+            t = threading.Thread(target=self._dispatch, args=(w,), daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def _dispatch(self, worker):
+        while True:
+            req = self.queue.get()
+            if req is None:
+                worker.close()
+                return
+            if req.cancelled:
+                continue
+            with self.stats.lock:
+                self.stats.in_flight += 1
+            try:
+                req.result = worker.run(req.job, self.timeout)
+            finally:
+                with self.stats.lock:
+                    self.stats.in_flight -= 1
+            req.done.set()
+
+    def submit(self, source, stdin_text):
+        # Returns a result dict, or None when the queue is full.
+        t0 = time.perf_counter()
+        key = run_key(source, stdin_text) if self.cache is not None else None
+        cached = self.cache.get(key) if key is not None else None
+        if cached is not None:
+            cached["cached"] = True
+            cached["timings"] = {"wall": time.perf_counter() - t0}
+            self.stats.record(cached["exit"], time.perf_counter() - t0, 0.0)
+            return cached
+
+        req = _Request({"source": source, "stdin": stdin_text})
+        try:
+            self.queue.put_nowait(req)
+        except queue.Full:
+            with self.stats.lock:
+                self.stats.rejected += 1
+            return None
+
+        # Queue wait counts against the deadline too; the worker enforces its
+        # own execution timeout, so allow one extra timeout for the wait.
+        if not req.done.wait(self.timeout * 2 + 1):
+            req.cancelled = True
+            result = {"stdout": "", "error": "The server was too busy to run this in time.",
+                      "exit": 124, "timings": {}}
+        else:
+            result = req.result
+            if key is not None:
+                self.cache.put(key, result)
+        latency = time.perf_counter() - t0
+        queue_wait = latency - result.get("timings", {}).get("wall", 0.0)
+        result.setdefault("timings", {})["queue"] = max(queue_wait, 0.0)
+        self.stats.record(result["exit"], latency, max(queue_wait, 0.0))
+        return result
+
+    def metrics_text(self):
+        s = self.stats
+        lines = []
+        with s.lock:
+            lines.append("# TYPE kidlang_requests_total counter")
+            for code, n in sorted(s.requests.items()):
+                lines.append(f'kidlang_requests_total{{exit="{code}"}} {n}')
+            lines.append("# TYPE kidlang_rejected_total counter")
+            lines.append(f"kidlang_rejected_total {s.rejected}")
+            lines.append("# TYPE kidlang_in_flight gauge")
+            lines.append(f"kidlang_in_flight {s.in_flight}")
+            lines.append("# TYPE kidlang_request_seconds summary")
+            lines.append(f"kidlang_request_seconds_sum {s.latency_sum}")
+            lines.append(f"kidlang_request_seconds_count {s.latency_count}")
+            lines.append("# TYPE kidlang_queue_wait_seconds_sum counter")
+            lines.append(f"kidlang_queue_wait_seconds_sum {s.queue_wait_sum}")
+        lines.append("# TYPE kidlang_queue_depth gauge")
+        lines.append(f"kidlang_queue_depth {self.queue.qsize()}")
+        lines.append("# TYPE kidlang_workers gauge")
+        lines.append(f"kidlang_workers {len(self.workers)}")
+        if self.cache is not None:
+            st = self.cache.stats()
+            lines.append("# TYPE kidlang_cache_hits_total counter")
+            lines.append(f"kidlang_cache_hits_total {st['hits']}")
+            lines.append("# TYPE kidlang_cache_misses_total counter")
+            lines.append(f"kidlang_cache_misses_total {st['misses']}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        for _ in self.workers:
+            self.queue.put(None)
+        for t in self.threads:
+            t.join(timeout=2)
+
+class Handler(BaseHTTPRequestHandler):
+    service: ExecService = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, code, body, ctype="application/json"):
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json(self, code, obj):
+        self._send(code, json.dumps(obj))
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._send(200, self.service.metrics_text(), "text/plain; version=0.0.4")
+        elif self.path == "/health":
+            self._json(200, {"ok": True})
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/run":
+            self._json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            self._json(413, {"error": "program too large"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            source = body["source"]
+            stdin = body.get("stdin", [])
+            if isinstance(stdin, list):
+                stdin = "".join(str(s) + "\n" for s in stdin)
+            if not isinstance(source, str) or not isinstance(stdin, str):
+                raise TypeError("source and stdin must be text")
+        except (ValueError, KeyError, TypeError) as e:
+            self._json(400, {"error": f"bad request: {e}"})
+            return
+
+        result = self.service.submit(source, stdin)
+        if result is None:
+            self._json(429, {"error": "too many programs waiting, try again soon"})
+            return
+        self._json(200, result)
+
+def serve(host="127.0.0.1", port=8765, **opts):
+    service = ExecService(**opts)
+    handler = type("BoundHandler", (Handler,), {"service": service})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    print(f"KidLang server on http://{host}:{httpd.server_port}", flush=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="kidlang.py serve")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    ap.add_argument("--queue", type=int, default=64, help="requests allowed to wait before 429")
+    ap.add_argument("--timeout", type=float, default=5.0, help="seconds per program")
+    ap.add_argument("--mem", type=int, default=None, help="memory cap per worker in MB")
+    ap.add_argument("--max-heap", type=float, default=DEFAULT_MAX_HEAP / MB,
+                    help="text one program may hold, in MB")
+    ap.add_argument("--lib", action="append", default=[], metavar="DIR",
+                    help="folder of modules programs may import (repeatable)")
+    ap.add_argument("--cache-size", type=int, default=4096, help="cached results to keep (0 disables)")
+    args = ap.parse_args(argv)
+
+    serve(
+        args.host, args.port,
+        workers=args.workers, queue_size=args.queue, timeout=args.timeout,
+        mem_mb=args.mem, cache_size=args.cache_size, max_heap=int(args.max_heap * MB),
+        import_path=args.lib,
+    )
+    return 0
@@ -0,0 +1,237 @@
+import math
+from array import array
+
+from kid_natives import Registry, VARIADIC
+from interpreter import (
+    RuntimeErrorKid, KidList, Rope, BIG_NUMBER_MSG, EXACT_INT, numpy, _num, _size, _numbers_only,
+)
+
+# The builtins every KidLang program starts with. Add more with
+# STDLIB.native(...) before creating an Interpreter (see kid_natives.py).
+
+STDLIB = Registry()
+native = STDLIB.native
+
+def _text(name, v):
+    if isinstance(v, Rope):
+        return str(v)
+    if not isinstance(v, str):
+        raise RuntimeErrorKid(f"{name}(...) needs text, like {name}(\"hello\").")
+    return v
+
+# input and output
+
+@native("say", (0, VARIADIC), bound=True)
+def say(interp, *args):
+    interp.write(" ".join(interp._stringify(a) for a in args) + "\n")
+    return None
+
+@native("ask", (0, 1), bound=True)
+def ask(interp, prompt=""):
+    if prompt is None:
+        prompt = ""
+    if not isinstance(prompt, str):
+        prompt = interp._stringify(prompt)
+    return interp.read_line(prompt)
+
+# lists
+
+@native("len", 1, pure=True, types=("any",))
+def len_(x):
+    if isinstance(x, (str, Rope, KidList)):
+        return len(x)
+    raise RuntimeErrorKid("len(...) works on text and lists.")
+
+@native("range", (1, 3), pure=True, types=("number",), bound=True)
+def range_(interp, *args):
+    start, step = 0, 1
+    if len(args) == 1:
+        stop = args[0]
+    elif len(args) == 2:
+        start, stop = args
+    else:
+        start, stop, step = args
+    start, stop, step = (int(_finite("range", v)) for v in (start, stop, step))
+    # Past 2**53 the list could not hold the numbers exactly, and len(range)
+    # could not even count them.
+    if not all(-EXACT_INT <= v <= EXACT_INT for v in (start, stop, step)):
+        raise RuntimeErrorKid(
+            f"range(...) works with whole numbers up to {EXACT_INT}.\n"
+            "Fix: use smaller numbers, or count with a while loop."
+        )
+    if step == 0:
+        raise RuntimeErrorKid("range(...) cannot count in steps of 0.")
+    r = range(start, stop, step)
+    interp._alloc(8 * len(r))
+    np = numpy()
+    if np is not None:
+        return KidList(np.arange(start, stop, step, dtype=float), True)
+    return KidList(array("d", r), True)
+
+# Python's sum/min/max would step through a NumPy array one boxed number at
+# a time; its own methods stay in native code.
+
+@native("sum", 1, pure=True, types=("list",))
+def sum_(xs):
+    items = _numbers_only("sum", xs)
+    return float(sum(items) if isinstance(items, array) else items.sum())
+
+@native("min", 1, pure=True, types=("list",))
+def min_(xs):
+    items = _numbers_only("min", xs)
+    if not len(items):
+        raise RuntimeErrorKid("min(...) needs at least one number in the list.")
+    return float(min(items) if isinstance(items, array) else items.min())
+
+@native("max", 1, pure=True, types=("list",))
+def max_(xs):
+    items = _numbers_only("max", xs)
+    if not len(items):
+        raise RuntimeErrorKid("max(...) needs at least one number in the list.")
+    return float(max(items) if isinstance(items, array) else items.max())
+
+@native("sort", 1, pure=True, types=("list",), bound=True)
+def sort(interp, xs):
+    if not isinstance(xs, KidList):
+        raise RuntimeErrorKid("sort(...) needs a list.")
+    interp._alloc(xs.size())
+    if xs.numeric:
+        np = numpy()
+        if np is not None:
+            return KidList(np.sort(xs.items), True)
+        return KidList(array("d", sorted(xs.items)), True)
+    if not (all(isinstance(v, str) for v in xs.items)
+            or all(type(v) is int or type(v) is float for v in xs.items)):
+        raise RuntimeErrorKid("sort(...) needs a list of only numbers or only text.")
+    return KidList(tuple(sorted(xs.items)), False)
+
+@native("push", 2, pure=True, types=("list", "any"), bound=True)
+def push(interp, xs, v):
+    if not isinstance(xs, KidList):
+        raise RuntimeErrorKid("push(list, value) needs a list first.")
+    interp._alloc(xs.size() + _size(v) + 8)
+    return KidList.of(xs.tolist() + [v])
+
+# math
+
+def _finite(name, x):
+    x = _num(x)
+    if type(x) is float and not math.isfinite(x):
+        raise RuntimeErrorKid(f"{name}(...) needs an ordinary number, not {x}.")
+    return x
+
+@native("abs", 1, pure=True, types=("number",))
+def abs_(x):
+    return abs(_num(x))
+
+ROUND_MAX_DIGITS = 308  # past this a double has no more digits to round
+
+@native("round", (1, 2), pure=True, types=("number",))
+def round_(x, digits=0):
+    # round() on a whole number works out 10 ** -digits first, so digits past
+    # the number's own length would take forever; the answer there is 0.
+    x = _finite("round", x)
+    digits = min(int(_finite("round", digits)), ROUND_MAX_DIGITS)
+    size = x.bit_length() * 0.302 + 1 if type(x) is int else ROUND_MAX_DIGITS + 2
+    if -digits > size:
+        return 0
+    r = round(x, digits)
+    return int(r) if digits <= 0 else r
+
+@native("floor", 1, pure=True, types=("number",))
+def floor(x):
+    return math.floor(_finite("floor", x))
+
+@native("ceil", 1, pure=True, types=("number",))
+def ceil(x):
+    return math.ceil(_finite("ceil", x))
+
+@native("sqrt", 1, pure=True, types=("number",))
+def sqrt(x):
+    x = _num(x)
+    if x < 0:
+        raise RuntimeErrorKid("sqrt(...) needs a number that is 0 or more.")
+    try:
+        return math.sqrt(x)
+    except OverflowError:  # a whole number too big for a decimal
+        raise RuntimeErrorKid(BIG_NUMBER_MSG)
+
+@native("mod", 2, pure=True, types=("number", "number"))
+def mod(a, b):
+    b = _num(b)
+    if b == 0:
+        raise RuntimeErrorKid("Division by zero.\nFix: do not use 0 as the second number of mod(...).")
+    try:
+        return _num(a) % b
+    except OverflowError:
+        raise RuntimeErrorKid(BIG_NUMBER_MSG)
+
+# text
+
+@native("upper", 1, pure=True, types=("text",))
+def upper(s):
+    return _text("upper", s).upper()
+
+@native("lower", 1, pure=True, types=("text",))
+def lower(s):
+    return _text("lower", s).lower()
+
+@native("trim", 1, pure=True, types=("text",))
+def trim(s):
+    return _text("trim", s).strip()
+
+@native("contains", 2, pure=True, types=("text", "text"))
+def contains(s, part):
+    return _text("contains", part) in _text("contains", s)
+
+@native("replace", 3, pure=True, types=("text", "text", "text"), bound=True)
+def replace(interp, s, old, new):
+    s, old, new = _text("replace", s), _text("replace", old), _text("replace", new)
+    if old == "":
+        raise RuntimeErrorKid("replace(...) needs something to look for, not empty text.")
+    interp._alloc(len(s) + s.count(old) * max(len(new) - len(old), 0))
+    return s.replace(old, new)
+
+@native("split", (1, 2), pure=True, types=("text", "text"), bound=True)
+def split(interp, s, sep=None):
+    # Each part costs its text plus 8; the count is checked before splitting.
+    s = _text("split", s)
+    if sep is None:
+        parts = (len(s) + 1) // 2  # at most: words are at least one character apart
+    else:
+        sep = _text("split", sep)
+        parts = len(s) if sep == "" else s.count(sep) + 1
+    interp._alloc(len(s) + 8 * parts)
+    if sep == "":
+        return KidList(tuple(s), False)
+    return KidList(tuple(s.split(sep)), False)
+
+@native("join", (1, 2), pure=True, types=("list", "text"), bound=True)
+def join(interp, xs, sep=""):
+    if not isinstance(xs, KidList):
+        raise RuntimeErrorKid("join(...) needs a list, like join([\"a\", \"b\"], \", \").")
+    sep = _text("join", sep)
+    parts = [interp._stringify(v) for v in xs.tolist()]
+    interp._alloc(sum(map(len, parts)) + len(sep) * max(len(parts) - 1, 0))
+    return sep.join(parts)
+
+@native("text", 1, pure=True, types=("any",), bound=True)
+def text(interp, v):
+    return interp._stringify(v)
+
+@native("number", 1, pure=True, types=("any",))
+def number(s):
+    if isinstance(s, (int, float)) and not isinstance(s, bool):
+        return s
+    raw = _text("number", s).strip()
+    try:
+        return int(raw)
+    except ValueError:
+        pass
+    try:
+        value = float(raw)
+    except ValueError:
+        raise RuntimeErrorKid(f"number(...) could not read {raw!r} as a number.")
+    if not math.isfinite(value):
+        raise RuntimeErrorKid(f"number(...) needs an ordinary number, not {raw!r}.")
+    return value
@@ -0,0 +1,399 @@
+import sys, zlib, struct, bisect, marshal, pathlib
+from array import array
+
+import ast_nodes as A
+from interpreter import Interpreter, Rope, KidList
+from kid_natives import NativeFunction
+
+# Execution traces for time-travel replay (`kidlang.py --record run.ktrace`).
+#
+# Layout:
+#   header   MAGIC, version, source text, line of every statement, variable names
+#   chunks   one per CHECKPOINT_EVERY steps:
+#              K <len> zlib(marshal((first step, checkpoint, sids, deltas)))
+#            checkpoint = {name id: value} of the names that changed since
+#                         the previous chunk's checkpoint
+#            sids       = statement id of each step, as array('I') bytes
+#            deltas     = [(step in chunk, name id, value), ...]
+#   footer   total steps, (first step, offset) of every chunk, names first
+#            seen after the header (imported ones), footer offset
+#
+# A value ("+", text) is a rope that grew: the text before it plus `text`, so
+# `s = s + "x"` stores one character per step instead of all of s. Unchanged
+# values (a big list that just sits in a variable) are written once.
+#
+# The hot path only appends to an array and a list (and, for a rope that grew,
+# the new pieces); encoding happens once per chunk. Seeking to step k bisects the chunk index, adds up the checkpoints
+# from the nearest remembered one (at most STATE_EVERY chunks back), then
+# applies at most CHECKPOINT_EVERY deltas, without running anything.
+
+MAGIC = b"KIDTRACE"
+VERSION = 3
+FOOTER = b"KTIX"
+CHECKPOINT_EVERY = 1000
+STATE_EVERY = 16  # the reader keeps the full variables of every 16th chunk
+
+STMT_TYPES = (A.LetStmt, A.AssignStmt, A.ExprStmt, A.IfStmt, A.WhileStmt, A.RepeatStmt,
+              A.FunStmt, A.ReturnStmt, A.ImportStmt)
+
+def number_statements(program):
+    return [n for n in A.walk(program) if isinstance(n, STMT_TYPES)]
+
+def _varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _read_varint(buf, i):
+    n = shift = 0
+    while True:
+        b = buf[i]
+        i += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, i
+        shift += 7
+
+def _text(out, s):
+    data = s.encode("utf-8", "surrogatepass")
+    _varint(out, len(data))
+    out += data
+
+def _read_text(buf, i):
+    n, i = _read_varint(buf, i)
+    return bytes(buf[i:i + n]).decode("utf-8", "surrogatepass"), i + n
+
+def _plain(v):
+    # marshal only knows Python's own scalars; anything else is kept as text.
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, Rope):
+        return str(v)
+    if isinstance(v, KidList):
+        return [_plain(x) for x in v.tolist()]
+    return f"<{type(v).__name__}>"
+
+def _grown(v, before):
+    # `before` is the value the reader will already have for this name. Taken
+    # when the step runs: a later append may move a rope onto a joined list.
+    if type(v) is Rope and type(before) is Rope and v.parts is before.parts and v.n >= before.n:
+        return ("+", v.parts[before.n:v.n])
+    return v
+
+def _encode(v):
+    if type(v) is tuple:
+        return ("+", "".join(v[1]))
+    return _plain(v)
+
+def _fold(values, changes):
+    # Applies (name id, value) pairs in order; grown ropes are joined once.
+    grown = {}
+    for nid, v in changes:
+        if type(v) is tuple:
+            parts = grown.get(nid)
+            if parts is None:
+                parts = grown[nid] = [values.get(nid, "")]
+            parts.append(v[1])
+        else:
+            grown.pop(nid, None)
+            values[nid] = v
+    for nid, parts in grown.items():
+        values[nid] = "".join(parts)
+    return values
+
+def _is_builtin(v):
+    return isinstance(v, NativeFunction)
+
+class RecordingInterpreter(Interpreter):
+    def __init__(self, *args, record=None, source="", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.trace_path = record
+        self.trace_source = source
+        self._file = None
+        self._sid_of = {}   # id(stmt) -> statement id
+        self._drec = {}     # id(stmt) -> (variable name, name id); (None, None) for import
+        self._names = {}
+        self._header_names = 0
+        self._steps = 0
+        self._chunk_start = 0
+        self._chunk_cp = {}
+        self._cp_values = {}  # name id -> value at the last checkpoint
+        self._last = {}       # name id -> value as of the last delta or checkpoint
+        self._chunk_sids = array("I")
+        self._chunk_deltas = []
+        self._chunks = []   # (first step, byte offset)
+        self._written = 0
+
+    def _name_id(self, name):
+        nid = self._names.get(name)
+        if nid is None:
+            nid = self._names[name] = len(self._names)
+        return nid
+
+    def run(self, program):
+        stmts = number_statements(program)
+        for sid, st in enumerate(stmts):
+            self._sid_of[id(st)] = sid
+            # Function locals vanish when the call returns; only globals are traced.
+            if isinstance(st, (A.LetStmt, A.AssignStmt)) and st.slot < 0 or isinstance(st, A.FunStmt):
+                self._drec[id(st)] = (st.name, self._name_id(st.name))
+            elif isinstance(st, A.ImportStmt):
+                self._drec[id(st)] = (None, None)  # its names are found after it runs
+        for name, v in self.env.values.items():
+            if not _is_builtin(v):
+                self._name_id(name)
+
+        head = bytearray(MAGIC)
+        head.append(VERSION)
+        _text(head, self.trace_source)
+        _varint(head, len(stmts))
+        for st in stmts:
+            _varint(head, st.line)
+        _varint(head, len(self._names))
+        for name in self._names:
+            _text(head, name)
+        self._header_names = len(self._names)
+        self._file = open(self.trace_path, "wb")
+        self._file.write(head)
+        self._written = len(head)
+        self._checkpoint()
+        try:
+            super().run(program)
+        finally:
+            self._finish()
+
+    def _snapshot(self):
+        return {
+            self._name_id(k): v
+            for k, v in self.env.values.items() if not _is_builtin(v)
+        }
+
+    def _checkpoint(self, deltas=()):
+        # Encodes the names that are not the same object as at the last
+        # checkpoint. A name whose every delta in the chunk just ended grew a
+        # rope (and whose last one is still its value) is those texts joined.
+        now = self._snapshot()
+        before, last = self._cp_values, self._last
+        grown = {}
+        for _, n, v in deltas:
+            if type(v) is tuple:
+                if grown.get(n, ()) is not None:
+                    grown.setdefault(n, []).append(v[1])
+            else:
+                grown[n] = None
+        cp = {}
+        for n, v in now.items():
+            if v is not before.get(n):
+                texts = grown.get(n)
+                cp[n] = ("+", "".join(texts)) if texts and v is last.get(n) else _plain(v)
+        self._chunk_cp = cp
+        self._cp_values = now
+        self._last = dict(now)
+
+    def _end_chunk(self):
+        deltas = [(i, n, _encode(v)) for i, n, v in self._chunk_deltas]
+        if self._chunk_sids:
+            payload = zlib.compress(marshal.dumps((
+                self._chunk_start,
+                self._chunk_cp,
+                self._chunk_sids.tobytes(),
+                deltas,
+            )), 1)
+            rec = bytearray(b"K")
+            _varint(rec, len(payload))
+            self._chunks.append((self._chunk_start, self._written))
+            self._file.write(rec)
+            self._file.write(payload)
+            self._written += len(rec) + len(payload)
+        self._chunk_start = self._steps
+        self._checkpoint(deltas)
+        self._chunk_sids = array("I")
+        self._chunk_deltas = []
+
+    def exec_stmt(self, stmt):
+        sids = self._chunk_sids
+        if len(sids) >= CHECKPOINT_EVERY:
+            self._end_chunk()
+            sids = self._chunk_sids
+        key = id(stmt)
+        sids.append(self._sid_of.get(key, 0))
+        self._steps += 1
+
+        result = super().exec_stmt(stmt)
+
+        d = self._drec.get(key)
+        if d is not None:
+            name = d[0]
+            if name is None:
+                self._imported()
+                return result
+            env = self.env
+            while env is not None and name not in env.values:
+                env = env.parent
+            if env is not None:
+                # A call in the value may have started a new chunk meanwhile.
+                v, nid, last = env.values[name], d[1], self._last
+                self._chunk_deltas.append((len(self._chunk_sids) - 1, nid, _grown(v, last.get(nid))))
+                last[nid] = v
+        return result
+
+    def _imported(self):
+        at, last = len(self._chunk_sids) - 1, self._last
+        for nid, v in self._snapshot().items():
+            if v is not last.get(nid):
+                self._chunk_deltas.append((at, nid, _grown(v, last.get(nid))))
+                last[nid] = v
+
+    def _finish(self):
+        if self._file is None:
+            return
+        self._end_chunk()
+        foot = bytearray(FOOTER)
+        _varint(foot, self._steps)
+        _varint(foot, len(self._chunks))
+        for step, off in self._chunks:
+            _varint(foot, step)
+            _varint(foot, off)
+        later = list(self._names)[self._header_names:]
+        _varint(foot, len(later))
+        for name in later:
+            _text(foot, name)
+        foot += struct.pack("<Q", self._written)
+        foot += FOOTER
+        self._file.write(foot)
+        self._file.close()
+        self._file = None
+
+class TraceReader:
+    def __init__(self, path):
+        buf = pathlib.Path(path).read_bytes()
+        if not buf.startswith(MAGIC) or buf[len(MAGIC)] != VERSION:
+            raise ValueError(f"{path} is not a KidLang trace (version {VERSION})")
+        self.buf = buf
+        i = len(MAGIC) + 1
+        self.source, i = _read_text(buf, i)
+        n, i = _read_varint(buf, i)
+        self.stmt_lines = []
+        for _ in range(n):
+            ln, i = _read_varint(buf, i)
+            self.stmt_lines.append(ln)
+        n, i = _read_varint(buf, i)
+        self.names = {}
+        for nid in range(n):
+            self.names[nid], i = _read_text(buf, i)
+        self.body_start = i
+
+        if buf.endswith(FOOTER) and len(buf) >= i + 12:
+            j = struct.unpack_from("<Q", buf, len(buf) - 12)[0] + len(FOOTER)
+            self.steps, j = _read_varint(buf, j)
+            count, j = _read_varint(buf, j)
+            self.chunks = []
+            for _ in range(count):
+                step, j = _read_varint(buf, j)
+                off, j = _read_varint(buf, j)
+                self.chunks.append((step, off))
+            n, j = _read_varint(buf, j)
+            for _ in range(n):
+                self.names[len(self.names)], j = _read_text(buf, j)
+        else:
+            self._rebuild_index()  # the run was cut off before the footer
+        self.chunk_steps = [s for s, _ in self.chunks]
+        self._cache = (None, None)
+        self._states = {}  # chunk number (a multiple of STATE_EVERY) -> variables as it starts
+
+    def _rebuild_index(self):
+        buf = self.buf
+        self.chunks = []
+        self.steps = 0
+        i = self.body_start
+        while i < len(buf) and buf[i] == 0x4B:  # K
+            try:
+                n, j = _read_varint(buf, i + 1)
+                if j + n > len(buf):
+                    break
+                chunk = marshal.loads(zlib.decompress(buf[j:j + n]))
+            except (IndexError, ValueError, EOFError, TypeError, zlib.error):
+                break
+            self.chunks.append((chunk[0], i))
+            self.steps = chunk[0] + len(chunk[2]) // 4
+            i = j + n
+
+    def _chunk(self, k):
+        if self._cache[0] == k:
+            return self._cache[1]
+        off = self.chunks[k][1]
+        n, j = _read_varint(self.buf, off + 1)
+        first, cp, sids, deltas = marshal.loads(zlib.decompress(self.buf[j:j + n]))
+        sid_arr = array("I")
+        sid_arr.frombytes(sids)
+        chunk = (first, cp, sid_arr, deltas)
+        self._cache = (k, chunk)
+        return chunk
+
+    def _start_state(self, k):
+        # Checkpoints only hold what changed, so they are added up from the
+        # last remembered chunk at or before k.
+        j = k - k % STATE_EVERY
+        while j > 0 and j not in self._states:
+            j -= STATE_EVERY
+        values = dict(self._states.get(j, {}))
+        for c in range(j + (j in self._states), k + 1):
+            _fold(values, self._chunk(c)[1].items())
+            if c % STATE_EVERY == 0:
+                self._states[c] = dict(values)
+        return values
+
+    def state_at(self, step):
+        # Step k (1-based) is the k-th statement to run. Returns that
+        # statement's id and the variables as they were just before it ran,
+        # the same view step mode shows.
+        if not self.chunks:
+            return None, {}
+        step = max(1, min(step, self.steps))
+        k = bisect.bisect_right(self.chunk_steps, step - 1) - 1
+        first, _, sids, deltas = self._chunk(k)
+        at = step - 1 - first
+        values = _fold(self._start_state(k), ((nid, v) for i, nid, v in deltas if i < at))
+        return sids[at], {self.names.get(n, f"#{n}"): v for n, v in values.items()}
+
+    def line_of(self, sid):
+        if sid is None or sid >= len(self.stmt_lines):
+            return 0
+        return self.stmt_lines[sid]
+
+def _show(v):
+    if v is None:
+        return "null"
+    if v is True:
+        return "true"
+    if v is False:
+        return "false"
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, str) else str(v)
+
+def format_state(values):
+    return "{ " + ", ".join(f"{k}={_show(v)}" for k, v in values.items()) + " }"
+
+def main(argv=None):
+    # python kid_trace.py run.ktrace [step]
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        print("usage: kid_trace.py TRACE [STEP]")
+        return 2
+    tr = TraceReader(argv[0])
+    if len(argv) < 2:
+        print(f"{tr.steps} steps in {len(tr.chunks)} chunks")
+        return 0
+    step = int(argv[1])
+    sid, values = tr.state_at(step)
+    line = tr.line_of(sid)
+    src = tr.source.splitlines()
+    text = src[line - 1].strip() if 0 < line <= len(src) else ""
+    print(f"step {step}/{tr.steps}  line {line}: {text}")
+    print("vars:", format_state(values))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,131 @@
-import sys, os, pathlib
+import sys, os, argparse, pathlib, multiprocessing
 sys.path.insert(0, os.path.dirname(__file__))
 
 from kid_lexer import lex
 from parser import Parser, ParseError
-from interpreter import Interpreter, RuntimeErrorKid
+from interpreter import Interpreter, RuntimeErrorKid, DEFAULT_MAX_HEAP
+
+def save_pgo(kid_pgo, src, path, profile, program):
+    target = kid_pgo.profile_path(src, path)
+    profile = kid_pgo.merge_profiles(kid_pgo.load_profile(target), profile)
+    try:
+        kid_pgo.save_profile(target, profile)
+    except OSError as e:
+        print(f"pgo: could not save the profile: {e}", file=sys.stderr)
+        return
+    loops = ", ".join(f"line {line} x{turns}" for line, turns in kid_pgo.hot_loops(profile, program))
+    print(f"pgo: {profile['runs']} run(s) recorded in {target}"
+          + (f"; hottest loops: {loops}" if loops else ""), file=sys.stderr)
 
 def main():
     # Run: python kidlang.py
     # Step mode: python kidlang.py --step
-    step = "--step" in sys.argv
+    # Batch mode: python kidlang.py batch <dir-or-manifest> (see kid_batch.py)
+    # Server mode: python kidlang.py serve --port 8765 (see kid_server.py)
+    # Interactive: python kidlang.py repl, or kernel for JSON lines (see kid_repl.py)
+    if len(sys.argv) >= 2 and sys.argv[1] == "batch":
+        import kid_batch
+        sys.exit(kid_batch.main(sys.argv[2:]))
+    if len(sys.argv) >= 2 and sys.argv[1] == "serve":
+        import kid_server
+        sys.exit(kid_server.main(sys.argv[2:]))
+    if len(sys.argv) >= 2 and sys.argv[1] in ("repl", "kernel"):
+        import kid_repl
+        sys.exit(kid_repl.main(sys.argv[2:], sys.argv[1]))
 
-    path = pathlib.Path("tests/main.kid")
-    if len(sys.argv) >= 2 and sys.argv[1] not in ("--step",):
-        path = pathlib.Path(sys.argv[1])
+    ap = argparse.ArgumentParser(prog="kidlang.py")
+    ap.add_argument("path", nargs="?", default="tests/main.kid")
+    ap.add_argument("--step", action="store_true", help="pause before every statement")
+    ap.add_argument("--profile", action="store_true", help="print time spent per line when done")
+    ap.add_argument("--profile-out", metavar="FILE", help="also write collapsed stacks for flamegraph tools")
+    ap.add_argument("--max-heap", metavar="MB", type=float, default=DEFAULT_MAX_HEAP / (1024 * 1024),
+                    help="most text the program may hold at once")
+    ap.add_argument("--lib", action="append", default=[], metavar="DIR",
+                    help="also look for imported modules here (repeatable)")
+    ap.add_argument("--memo", action="store_true", help="remember results of pure functions")
+    ap.add_argument("--sequential", action="store_true",
+                    help="never split repeat loops across processes (see kid_parallel.py)")
+    ap.add_argument("--jobs", metavar="N", type=int, help="processes for parallel repeat loops (default: CPUs)")
+    ap.add_argument("--metrics", metavar="FILE", help="write run metrics as JSON")
+    ap.add_argument("--record", metavar="FILE", help="record a replayable trace (see kid_trace.py)")
+    ap.add_argument("--debug", metavar="PORT", type=int, help="attach to a debugger on this local port (see kid_debug.py)")
+    ap.add_argument("--pgo", choices=("record", "use", "off"), default="off",
+                    help="save a run profile of this program, or run faster with it (see kid_pgo.py)")
+    args = ap.parse_args()
+    if args.pgo != "off" and (args.step or args.profile or args.profile_out or args.metrics
+                              or args.record or args.debug):
+        ap.error("--pgo only works on plain runs")
 
+    path = pathlib.Path(args.path)
     src = path.read_text(encoding="utf-8")
 
-    tokens = lex(src)
-    program = Parser(tokens).parse()
+    extras = []
+    kwargs = {
+        "step": args.step,
+        "max_heap": int(args.max_heap * 1024 * 1024),
+        "memo": args.memo,
+        "import_path": [path.parent, *args.lib],
+    }
+    if args.profile or args.profile_out:
+        from kid_profile import ProfilingInterpreter
+        extras.append(ProfilingInterpreter)
+    if args.metrics:
+        import kid_metrics
+        extras.append(kid_metrics.MeteredInterpreter)
+        kwargs["metrics"] = kid_metrics.Metrics()
+    if args.record:
+        from kid_trace import RecordingInterpreter
+        extras.append(RecordingInterpreter)
+        kwargs["record"] = args.record
+        kwargs["source"] = src
+
+    if args.debug:
+        from kid_debug import DebugInterpreter, DebugChannel
+        extras.append(DebugInterpreter)
+        kwargs["debug"] = DebugChannel.connect(args.debug)
+
+    if args.pgo == "record":
+        import kid_pgo
+        extras.append(kid_pgo.PGORecorder)
+
+    # Tools that watch every statement need the loops to run here, in order.
+    if not (extras or args.step or args.sequential):
+        from kid_parallel import ParallelInterpreter
+        extras.append(ParallelInterpreter)
+        kwargs["jobs"] = args.jobs
+
+    interp_cls = Interpreter
+    if len(extras) == 1:
+        interp_cls = extras[0]
+    elif extras:
+        interp_cls = type("KidInterpreter", tuple(extras), {})
+    interp = interp_cls(**kwargs)
 
     try:
-        Interpreter(step=step).run(program)
-    except (RuntimeErrorKid, ParseError) as e:
+        if args.metrics:
+            kid_metrics.run_with_metrics(src, interp.metrics, interp)
+        else:
+            tokens = lex(src)
+            program = Parser(tokens).parse()
+            if args.pgo == "use":
+                import kid_pgo
+                profile = kid_pgo.load_profile(kid_pgo.profile_path(src, path))
+                kid_pgo.apply_profile(program, profile, interp.env.values)
+            interp.run(program)
+            if args.pgo == "record":
+                save_pgo(kid_pgo, src, path, interp.profile, program)
+    except (RuntimeErrorKid, ParseError, SyntaxError) as e:
         print("\nERROR:")
         print(e)
+    finally:
+        if args.profile:
+            print("\n--- PROFILE ---", file=sys.stderr)
+            print(interp.report(src.splitlines()), file=sys.stderr)
+        if args.profile_out:
+            pathlib.Path(args.profile_out).write_text(interp.collapsed(), encoding="utf-8")
+        if args.metrics:
+            pathlib.Path(args.metrics).write_text(interp.metrics.to_json() + "\n", encoding="utf-8")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # parallel repeat workers in the packaged IDE
     main()
@@ -1,4 +1,4 @@
-import os, sys, time, threading, queue, subprocess, pathlib, tkinter as tk
+import os, sys, time, json, socket, threading, queue, subprocess, pathlib, tkinter as tk
 from tkinter import filedialog, messagebox
 
 # Check for display
@@ -11,8 +11,59 @@ except tk.TclError as e:
 
 BASE = pathlib.Path(__file__).resolve().parent
 SCRATCH = BASE / "tests" / "_scratch.kid"
+TRACE = BASE / "tests" / "_scratch.ktrace"
 RUNNER = BASE / "kidlang.py"
 
+class ReplayWindow(tk.Toplevel):
+    # Slide back and forth through a recorded run (see kid_trace.py).
+    def __init__(self, master, trace_path):
+        super().__init__(master)
+        from kid_trace import TraceReader, format_state
+        self.format_state = format_state
+        self.trace = TraceReader(trace_path)
+        self.title(f"Replay - {self.trace.steps} steps")
+        self.geometry("800x600")
+
+        top = tk.Frame(self)
+        top.pack(fill="x")
+        tk.Button(top, text="<", command=lambda: self.move(-1)).pack(side="left", padx=4, pady=4)
+        tk.Button(top, text=">", command=lambda: self.move(1)).pack(side="left", padx=4, pady=4)
+        self.info = tk.Label(top, anchor="w")
+        self.info.pack(side="left", fill="x", expand=True, padx=8)
+
+        self.scale = tk.Scale(
+            self, from_=1, to=max(self.trace.steps, 1), orient="horizontal",
+            showvalue=False, command=lambda v: self.show(int(float(v))),
+        )
+        self.scale.pack(fill="x", padx=4)
+
+        self.source = tk.Text(self, wrap="none", height=20)
+        self.source.pack(fill="both", expand=True, padx=4)
+        self.source.insert("1.0", self.trace.source)
+        self.source.tag_configure("current", background="#fff2a8")
+        self.source.configure(state="disabled")
+
+        self.vars = tk.Text(self, height=6, wrap="word", bg="#0f0f0f", fg="#e8e8e8")
+        self.vars.pack(fill="x", padx=4, pady=4)
+
+        self.step = 1
+        self.show(1)
+
+    def move(self, delta):
+        self.scale.set(max(1, min(self.trace.steps, self.step + delta)))
+
+    def show(self, step):
+        self.step = step
+        sid, values = self.trace.state_at(step)
+        line = self.trace.line_of(sid)
+        self.info.config(text=f"step {step} of {self.trace.steps}   line {line}")
+        self.source.tag_remove("current", "1.0", "end")
+        if line:
+            self.source.tag_add("current", f"{line}.0", f"{line}.end")
+            self.source.see(f"{line}.0")
+        self.vars.delete("1.0", "end")
+        self.vars.insert("1.0", "vars: " + self.format_state(values))
+
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -45,6 +96,28 @@ class App(tk.Tk):
         self.chk_step = tk.Checkbutton(top, text="Step mode", variable=self.step_var)
         self.chk_step.pack(side="left", padx=10)
 
+        self.record_var = tk.BooleanVar(value=False)
+        self.chk_record = tk.Checkbutton(top, text="Record", variable=self.record_var)
+        self.chk_record.pack(side="left", padx=4)
+
+        self.btn_replay = tk.Button(top, text="Replay", command=self.open_replay)
+        self.btn_replay.pack(side="left", padx=4, pady=4)
+
+        dbg = tk.Frame(self)
+        dbg.pack(fill="x")
+
+        self.btn_debug = tk.Button(dbg, text="Debug", command=lambda: self.run_code(debug=True))
+        self.btn_debug.pack(side="left", padx=4, pady=2)
+        for label, cmd in (("Continue", "continue"), ("Step", "step"), ("Next", "next"), ("Out", "out")):
+            tk.Button(dbg, text=label, command=lambda c=cmd: self.debug_cmd(c)).pack(side="left", padx=2, pady=2)
+
+        tk.Label(dbg, text="Breakpoints (e.g. 4, 9 if x == 5000, 12 @100):").pack(side="left", padx=(12, 4))
+        self.bp_entry = tk.Entry(dbg)
+        self.bp_entry.pack(side="left", fill="x", expand=True, padx=4, pady=2)
+
+        self.dbg_conn = None
+        self.dbg_w = None
+
         mid = tk.PanedWindow(self, orient="vertical", sashrelief="raised")
         mid.pack(fill="both", expand=True)
 
@@ -60,6 +133,7 @@ class App(tk.Tk):
         ed_scroll_y = tk.Scrollbar(editor_frame, command=self.editor.yview)
         ed_scroll_y.pack(side="right", fill="y")
         self.editor.configure(yscrollcommand=ed_scroll_y.set)
+        self.editor.tag_configure("debugline", background="#fff2a8")
 
         self.output = tk.Text(output_frame, height=12, wrap="word", bg="#0f0f0f", fg="#e8e8e8")
         self.output.pack(fill="both", expand=True, side="top")
@@ -156,7 +230,7 @@ class App(tk.Tk):
         SCRATCH.parent.mkdir(parents=True, exist_ok=True)
         SCRATCH.write_text(self.editor.get("1.0", "end-1c"), encoding="utf-8")
 
-    def run_code(self):
+    def run_code(self, debug=False):
         if not RUNNER.exists():
             messagebox.showerror("Missing kidlang.py", f"Not found: {RUNNER}")
             return
@@ -168,8 +242,18 @@ class App(tk.Tk):
         self.clear_out()
 
         args = [sys.executable, str(RUNNER), str(SCRATCH)]
+        if self.current_file is not None:
+            args += ["--lib", str(self.current_file.parent)]  # modules next to the open file
         if self.step_var.get():
             args.append("--step")
+        if self.record_var.get():
+            args += ["--record", str(TRACE)]
+        if debug:
+            srv = socket.socket()
+            srv.bind(("127.0.0.1", 0))
+            srv.listen(1)
+            args += ["--debug", str(srv.getsockname()[1])]
+            threading.Thread(target=self._debug_thread, args=(srv,), daemon=True).start()
 
         self.write_out(f"[run] {' '.join(args)}\n\n")
 
@@ -210,10 +294,75 @@ class App(tk.Tk):
             self.q.put(f"\n[exit] {rc}\n")
             self.q.put(("__DONE__",))
 
+    def _debug_thread(self, srv):
+        srv.settimeout(15)
+        try:
+            conn, _ = srv.accept()
+        except OSError:
+            self.q.put("\n[debug] program did not connect\n")
+            return
+        finally:
+            srv.close()
+        self.dbg_conn = conn
+        self.dbg_w = conn.makefile("w", encoding="utf-8")
+        try:
+            for line in conn.makefile("r", encoding="utf-8"):
+                self.q.put(("__DBG__", json.loads(line)))
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.dbg_w = None
+            self.dbg_conn = None
+
+    def debug_cmd(self, cmd, **extra):
+        if self.dbg_w is None:
+            return
+        try:
+            self.dbg_w.write(json.dumps({"cmd": cmd, **extra}) + "\n")
+            self.dbg_w.flush()
+        except OSError:
+            pass
+
+    def _breakpoints(self):
+        for item in self.bp_entry.get().split(","):
+            item = item.strip()
+            if not item or not item[0].isdigit():
+                continue
+            line, _, rest = item.partition(" ")
+            rest = rest.strip()
+            bp = {"line": int(line)}
+            if rest.startswith("if "):
+                bp["cond"] = rest[3:].strip()
+            elif rest.startswith("@") and rest[1:].isdigit():
+                bp["hits"] = int(rest[1:])
+            yield bp
+
+    def _on_debug(self, msg):
+        ev = msg.get("event")
+        self.editor.tag_remove("debugline", "1.0", "end")
+        if ev == "stopped":
+            if msg["reason"] == "entry":
+                for bp in self._breakpoints():
+                    self.debug_cmd("break", **bp)
+                self.debug_cmd("continue")
+                return
+            line = msg["line"]
+            self.editor.tag_add("debugline", f"{line}.0", f"{line}.end")
+            self.editor.see(f"{line}.0")
+            shown = ", ".join(f"{k}={v}" for k, v in msg.get("vars", {}).items())
+            self.write_out(f"\n[debug] line {line} ({msg['reason']})  {{ {shown} }}\n")
+        elif ev == "error":
+            self.write_out(f"\n[debug] {msg.get('message')}\n")
+        elif ev == "breakpoint" and not msg.get("verified"):
+            self.write_out(f"\n[debug] no statement on line {msg['line']}\n")
+
     def _drain_queue(self):
         try:
             while True:
                 item = self.q.get_nowait()
+                if isinstance(item, tuple) and item[0] == "__DBG__":
+                    self._on_debug(item[1])
+                    continue
                 if item == ("__DONE__",) or item == "__DONE__":
                     self.proc = None
                     self.btn_run.config(state="normal")
@@ -233,6 +382,15 @@ class App(tk.Tk):
             pass
         self.write_out("\n[stopped]\n")
 
+    def open_replay(self):
+        if not TRACE.exists():
+            messagebox.showinfo("Replay", "Run a program with Record turned on first.")
+            return
+        try:
+            ReplayWindow(self, TRACE)
+        except Exception as e:
+            messagebox.showerror("Replay failed", str(e))
+
     def send_stdin_btn(self):
         self.send_stdin(None)
 
@@ -5,10 +5,24 @@ import ast_nodes as A
 class ParseError(Exception):
     pass
 
+def number_locals(params, body):
+    # Parameters take the first slots, then each name the body makes with `let`.
+    slots = {p: i for i, p in enumerate(params)}
+    nodes = list(A.walk(A.Program(body)))
+    for node in nodes:
+        if isinstance(node, A.LetStmt) and node.name not in slots:
+            slots[node.name] = len(slots)
+    for node in nodes:
+        if isinstance(node, (A.Var, A.LetStmt, A.AssignStmt)):
+            node.slot = slots.get(node.name, -1)
+    return list(slots)
+
 class Parser:
     def __init__(self, tokens: List[Token]):
         self.tokens = tokens
         self.i = 0
+        self.depth = 0
+        self.in_fun = False
 
     def peek(self) -> Token:
         return self.tokens[self.i]
@@ -66,7 +80,16 @@ class Parser:
             self.skip_newlines()
         return A.Program(stmts)
 
+    def _at(self, node, tok: Token):
+        node.line = tok.line
+        node.col = tok.col
+        return node
+
     def statement(self):
+        start = self.peek()
+        return self._at(self._statement(), start)
+
+    def _statement(self):
         if self.match_kw("let"):
             name = self.consume("IDENT", "Expected variable name").lexeme
             self.consume("EQUAL", "Expected '=' after variable name")
@@ -82,6 +105,19 @@ class Parser:
         if self.match_kw("repeat"):
             return self.repeat_stmt()
 
+        if self.match_kw("fun"):
+            return self.fun_stmt()
+
+        if self.match_kw("return"):
+            return self.return_stmt()
+
+        if self.match_kw("import"):
+            kw = self.prev()
+            if self.depth:
+                raise ParseError(f"Put `import` at the top of your program, not inside a block, at {kw.line}:{kw.col}")
+            name = self.consume("STRING", 'Expected a module name in quotes, like import "shapes",').lexeme
+            return A.ImportStmt(name)
+
         if self.check("IDENT") and self._looks_like_assign():
             name = self.advance().lexeme
             self.consume("EQUAL", "Expected '=' in assignment")
@@ -129,12 +165,46 @@ class Parser:
         self.consume("KW", "Expected 'end' to close repeat", "end")
         return A.RepeatStmt(count_expr, body)
 
+    def fun_stmt(self):
+        kw = self.prev()
+        if self.depth:
+            raise ParseError(f"Put `fun` at the top of your program, not inside another block, at {kw.line}:{kw.col}")
+        name = self.consume("IDENT", "Expected function name after fun").lexeme
+        self.consume("LPAREN", "Expected '(' after function name")
+        params = []
+        if not self.check("RPAREN"):
+            params.append(self.consume("IDENT", "Expected parameter name").lexeme)
+            while self.match("COMMA"):
+                t = self.consume("IDENT", "Expected parameter name")
+                if t.lexeme in params:
+                    raise ParseError(f"Parameter {t.lexeme!r} is listed twice at {t.line}:{t.col}")
+                params.append(t.lexeme)
+        self.consume("RPAREN", "Expected ')' after parameters")
+        self.consume("NEWLINE", "Expected newline after fun header")
+        self.in_fun = True
+        try:
+            body = self.block_until({"end"})
+        finally:
+            self.in_fun = False
+        self.consume("KW", "Expected 'end' to close fun", "end")
+        return A.FunStmt(name, params, body, number_locals(params, body))
+
+    def return_stmt(self):
+        kw = self.prev()
+        if not self.in_fun:
+            raise ParseError(f"`return` only works inside a fun, at {kw.line}:{kw.col}")
+        if self.check("NEWLINE") or self.at_end() or self.check("KW", "end"):
+            return A.ReturnStmt()
+        return A.ReturnStmt(self.expression())
+
     def block_until(self, end_keywords: set[str]):
         stmts = []
+        self.depth += 1
         self.skip_newlines()
         while not self.at_end() and not (self.check("KW") and self.peek().lexeme in end_keywords):
             stmts.append(self.statement())
             self.skip_newlines()
+        self.depth -= 1
         return stmts
 
     # expressions
@@ -142,20 +212,23 @@ class Parser:
         return self.logic_or()
 
     def logic_or(self):
+        start = self.peek()
         expr = self.logic_and()
         while self.match_kw("or"):
             right = self.logic_and()
-            expr = A.Binary(expr, "or", right)
+            expr = self._at(A.Binary(expr, "or", right), start)
         return expr
 
     def logic_and(self):
+        start = self.peek()
         expr = self.equality()
         while self.match_kw("and"):
             right = self.equality()
-            expr = A.Binary(expr, "and", right)
+            expr = self._at(A.Binary(expr, "and", right), start)
         return expr
 
     def equality(self):
+        start = self.peek()
         expr = self.compare()
         while True:
             if self.match("EQEQ"):
@@ -165,10 +238,11 @@ class Parser:
             else:
                 break
             right = self.compare()
-            expr = A.Binary(expr, op, right)
+            expr = self._at(A.Binary(expr, op, right), start)
         return expr
 
     def compare(self):
+        start = self.peek()
         expr = self.term()
         while True:
             if self.match("LT"):
@@ -182,10 +256,11 @@ class Parser:
             else:
                 break
             right = self.term()
-            expr = A.Binary(expr, op, right)
+            expr = self._at(A.Binary(expr, op, right), start)
         return expr
 
     def term(self):
+        start = self.peek()
         expr = self.factor()
         while True:
             if self.match("PLUS"):
@@ -195,10 +270,11 @@ class Parser:
             else:
                 break
             right = self.factor()
-            expr = A.Binary(expr, op, right)
+            expr = self._at(A.Binary(expr, op, right), start)
         return expr
 
     def factor(self):
+        start = self.peek()
         expr = self.unary()
         while True:
             if self.match("STAR"):
@@ -208,17 +284,19 @@ class Parser:
             else:
                 break
             right = self.unary()
-            expr = A.Binary(expr, op, right)
+            expr = self._at(A.Binary(expr, op, right), start)
         return expr
 
     def unary(self):
+        start = self.peek()
         if self.match_kw("not"):
-            return A.Unary("not", self.unary())
+            return self._at(A.Unary("not", self.unary()), start)
         if self.match("MINUS"):
-            return A.Unary("-", self.unary())
+            return self._at(A.Unary("-", self.unary()), start)
         return self.call()
 
     def call(self):
+        start = self.peek()
         expr = self.primary()
         while True:
             if self.match("LPAREN"):
@@ -228,36 +306,51 @@ class Parser:
                     while self.match("COMMA"):
                         args.append(self.expression())
                 self.consume("RPAREN", "Expected ')' after arguments")
-                expr = A.Call(expr, args)
+                expr = self._at(A.Call(expr, args), start)
+                continue
+            if self.match("LBRACKET"):
+                index = self.expression()
+                self.consume("RBRACKET", "Expected ']' after position")
+                expr = self._at(A.Index(expr, index), start)
                 continue
             break
         return expr
 
     def primary(self):
+        start = self.peek()
         if self.match("NUMBER"):
             raw = self.prev().lexeme
             if "." in raw:
-                return A.Number(float(raw))
-            return A.Number(int(raw))
+                return self._at(A.Number(float(raw)), start)
+            return self._at(A.Number(int(raw)), start)
 
         if self.match("STRING"):
-            return A.String(self.prev().lexeme)
+            return self._at(A.String(self.prev().lexeme), start)
 
         if self.match("IDENT"):
-            return A.Var(self.prev().lexeme)
+            return self._at(A.Var(self.prev().lexeme), start)
 
         if self.match_kw("true"):
-            return A.Bool(True)
+            return self._at(A.Bool(True), start)
         if self.match_kw("false"):
-            return A.Bool(False)
+            return self._at(A.Bool(False), start)
         if self.match_kw("null"):
-            return A.Null()
+            return self._at(A.Null(), start)
 
         if self.match("LPAREN"):
             expr = self.expression()
             self.consume("RPAREN", "Expected ')' after expression")
             return expr
 
+        if self.match("LBRACKET"):
+            items = []
+            if not self.check("RBRACKET"):
+                items.append(self.expression())
+                while self.match("COMMA"):
+                    items.append(self.expression())
+            self.consume("RBRACKET", "Expected ']' after list items")
+            return self._at(A.ListLit(items), start)
+
         t = self.peek()
         raise ParseError(f"Expected expression at {t.line}:{t.col} (got {t.kind}:{t.lexeme!r})")
 
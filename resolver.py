@@ -0,0 +1,141 @@
+import threading
+from dataclasses import fields
+
+import ast_nodes as A
+from parser import ParseError
+from kid_natives import NativeFunction
+
+# A pass over a parsed program, run once before it first runs.
+#
+# Calls like len(xs) whose name can only ever mean the builtin (the program
+# never makes its own `len` and imports nothing that could) get the builtin
+# stored on the Call node, so running them skips the variable lookup.
+# Those calls, and calls to the program's own funs, have their number of
+# values checked here, and literal values of the wrong kind (sqrt("four"))
+# are refused, so the mistake is reported before anything runs. A call to a
+# pure builtin with only literal values, like sqrt(16), is worked out now and
+# replaced by its answer.
+#
+# Programs can be shared between interpreters (the module cache), so a
+# program is resolved once, under a lock, and marked as done.
+
+FOLD_MAX_TEXT = 10000  # longer folded text would bloat the tree
+FOLD_MAX_NUMBER = 10 ** 9  # a builtin's work can grow with its values; big ones wait for run time
+
+_lock = threading.Lock()
+
+_KINDS = {A.Number: "number", A.String: "text", A.Bool: "bool", A.ListLit: "list", A.Null: "null"}
+_SAY = {"number": "a number", "text": "text", "bool": "true or false", "list": "a list", "null": "null"}
+
+def resolve(program, env_values):
+    with _lock:
+        if program.resolved:
+            return
+        _Resolver(program, env_values).run()
+        program.resolved = True
+
+def _literal(node):
+    # (True, value) for a constant expression this pass can fold, else (False, None)
+    if isinstance(node, A.Unary) and node.op == "-" and isinstance(node.right, A.Number):
+        ok, value = _literal(node.right)
+        return ok, -value if ok else None
+    if isinstance(node, A.Number) and abs(node.value) > FOLD_MAX_NUMBER:
+        return False, None
+    if isinstance(node, A.String) and len(node.value) > FOLD_MAX_TEXT:
+        return False, None
+    if isinstance(node, (A.Number, A.String, A.Bool, A.Null)):
+        return True, node.value
+    return False, None
+
+def _literal_node(value, like):
+    if value is None:
+        node = A.Null()
+    elif isinstance(value, bool):
+        node = A.Bool(value)
+    elif isinstance(value, (int, float)):
+        node = A.Number(value)
+    elif isinstance(value, str) and len(value) <= FOLD_MAX_TEXT:
+        node = A.String(value)
+    else:
+        return None
+    node.line, node.col = like.line, like.col
+    return node
+
+class _Resolver:
+    def __init__(self, program, env_values):
+        self.program = program
+        self.natives = {}
+        self.funs = {}
+        nodes = list(A.walk(program))
+        if any(isinstance(n, A.ImportStmt) for n in nodes):
+            return  # a module may bring in its own `len`; bind nothing
+        made = set()
+        counts = {}
+        for n in nodes:
+            if isinstance(n, (A.LetStmt, A.AssignStmt)) and n.slot < 0:
+                made.add(n.name)
+            elif isinstance(n, A.FunStmt):
+                counts[n.name] = counts.get(n.name, 0) + 1
+                self.funs[n.name] = n
+        for name, v in env_values.items():
+            if isinstance(v, NativeFunction) and name not in made and name not in counts:
+                self.natives[name] = v
+        self.funs = {k: f for k, f in self.funs.items() if counts[k] == 1 and k not in made}
+
+    def run(self):
+        if not self.natives and not self.funs:
+            return
+        self.program.statements = [self.visit(s) for s in self.program.statements]
+
+    def visit(self, node):
+        if not isinstance(node, A.Node):
+            return node
+        for f in fields(node):
+            v = getattr(node, f.name)
+            if isinstance(v, list):
+                setattr(node, f.name, [self.visit(x) for x in v])
+            elif isinstance(v, A.Node):
+                setattr(node, f.name, self.visit(v))
+        if isinstance(node, A.Call) and isinstance(node.callee, A.Var) and node.callee.slot < 0:
+            return self.call(node, node.callee.name)
+        return node
+
+    def call(self, node, name):
+        n = len(node.args)
+        fun = self.funs.get(name)
+        if fun is not None:
+            if n != len(fun.params):
+                raise ParseError(
+                    f"{name} needs {len(fun.params)} value(s), but got {n} at {node.line}:{node.col}\n"
+                    f"Fix: call it like {name}({', '.join(fun.params)})."
+                )
+            return node
+        native = self.natives.get(name)
+        if native is None:
+            return node
+        if not native.accepts(n):
+            raise ParseError(f"{native.arity_error(n)[:-1]} at {node.line}:{node.col}")
+        for i, arg in enumerate(node.args):
+            want = native.type_of(i)
+            got = _KINDS.get(type(arg))
+            if want != "any" and got is not None and got != want:
+                raise ParseError(
+                    f"{name}(...) needs {_SAY[want]} for value {i + 1}, "
+                    f"but got {_SAY[got]} at {arg.line}:{arg.col}"
+                )
+        node.native = native
+        if native.pure and not native.bound:
+            values = []
+            for arg in node.args:
+                ok, value = _literal(arg)
+                if not ok:
+                    return node
+                values.append(value)
+            try:
+                value = native.fn(*values)
+            except Exception:
+                return node  # leave the error for run time, with its usual message
+            folded = _literal_node(value, node)
+            if folded is not None:
+                return folded
+        return node